@@ -77,6 +77,13 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # The name search indexes are created by hand in a migration and are not
+    # part of the models, so autogenerate must not try to drop them.
+    def include_object(object, name, type_, reflected, compare_to):
+        if reflected and compare_to is None and name is not None:
+            return '_fts' not in name and not name.endswith('_trgm')
+        return True
+
     connectable = current_app.extensions['migrate'].db.get_engine()
 
     with connectable.connect() as connection:
@@ -84,6 +91,7 @@ def run_migrations_online():
             connection=connection,
             target_metadata=get_metadata(),
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions['migrate'].configure_args
         )
 
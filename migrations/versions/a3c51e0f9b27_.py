@@ -0,0 +1,35 @@
+"""favorite composite indexes
+
+Revision ID: a3c51e0f9b27
+Revises: 6ee6dc8af0b6
+Create Date: 2026-10-17 09:12:41.208316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c51e0f9b27'
+down_revision = '6ee6dc8af0b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_favorite_user_id_entity', 'favorite', ['user_id', 'entity_type_id', 'entity_id'], unique=True)
+    op.create_index('ix_favorite_user_id_id', 'favorite', ['user_id', 'id'], unique=False)
+    op.create_index('ix_favorite_entity', 'favorite', ['entity_type_id', 'entity_id'], unique=False)
+    # The unique index above supersedes the unnamed constraint from the initial
+    # migration. SQLite cannot drop an unnamed constraint, so it is only removed
+    # on PostgreSQL, where it got the default name.
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_constraint('favorite_user_id_entity_id_entity_type_id_key', 'favorite', type_='unique')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.create_unique_constraint('favorite_user_id_entity_id_entity_type_id_key', 'favorite', ['user_id', 'entity_id', 'entity_type_id'])
+    op.drop_index('ix_favorite_entity', table_name='favorite')
+    op.drop_index('ix_favorite_user_id_id', table_name='favorite')
+    op.drop_index('ix_favorite_user_id_entity', table_name='favorite')
@@ -0,0 +1,29 @@
+"""table version counters for conditional GETs
+
+Revision ID: b5e1c3f7a2d4
+Revises: f2c8d5a7e913
+Create Date: 2026-10-17 19:06:37.218405
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e1c3f7a2d4'
+down_revision = 'f2c8d5a7e913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('table_version',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('table_version')
@@ -0,0 +1,44 @@
+"""character and planet filter and sort indexes
+
+Revision ID: c7d2e4b18f53
+Revises: a3c51e0f9b27
+Create Date: 2026-10-17 11:03:27.519204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d2e4b18f53'
+down_revision = 'a3c51e0f9b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_character_homeworld_id_id', 'character', ['homeworld_id', 'id'], unique=False)
+    op.create_index('ix_character_gender_id_id', 'character', ['gender_id', 'id'], unique=False)
+    op.create_index('ix_character_eye_color_id_id', 'character', ['eye_color_id', 'id'], unique=False)
+    op.create_index('ix_character_hair_color_id_id', 'character', ['hair_color_id', 'id'], unique=False)
+    op.create_index('ix_character_skin_color_id_id', 'character', ['skin_color_id', 'id'], unique=False)
+    op.create_index('ix_character_name_id', 'character', ['name', 'id'], unique=False)
+    op.create_index('ix_character_height_id', 'character', ['height', 'id'], unique=False)
+    op.create_index('ix_character_mass_id', 'character', ['mass', 'id'], unique=False)
+    op.create_index('ix_planet_population_id', 'planet', ['population', 'id'], unique=False)
+    op.create_index('ix_planet_diameter_id', 'planet', ['diameter', 'id'], unique=False)
+    op.create_index('ix_planet_gravity_id', 'planet', ['gravity', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_planet_gravity_id', table_name='planet')
+    op.drop_index('ix_planet_diameter_id', table_name='planet')
+    op.drop_index('ix_planet_population_id', table_name='planet')
+    op.drop_index('ix_character_mass_id', table_name='character')
+    op.drop_index('ix_character_height_id', table_name='character')
+    op.drop_index('ix_character_name_id', table_name='character')
+    op.drop_index('ix_character_skin_color_id_id', table_name='character')
+    op.drop_index('ix_character_hair_color_id_id', table_name='character')
+    op.drop_index('ix_character_eye_color_id_id', table_name='character')
+    op.drop_index('ix_character_gender_id_id', table_name='character')
+    op.drop_index('ix_character_homeworld_id_id', table_name='character')
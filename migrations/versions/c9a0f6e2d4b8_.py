@@ -0,0 +1,54 @@
+"""character and planet name search indexes
+
+Revision ID: c9a0f6e2d4b8
+Revises: c7d2e4b18f53
+Create Date: 2026-10-17 13:41:09.880147
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9a0f6e2d4b8'
+down_revision = 'c7d2e4b18f53'
+branch_labels = None
+depends_on = None
+
+SEARCH_TABLES = ('character', 'planet')
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        # External-content FTS5 tables kept in sync by triggers.
+        for name in SEARCH_TABLES:
+            op.execute(f"CREATE VIRTUAL TABLE {name}_fts USING fts5(name, content='{name}', content_rowid='id')")
+            op.execute(f"INSERT INTO {name}_fts(rowid, name) SELECT id, name FROM \"{name}\"")
+            op.execute(f"""CREATE TRIGGER {name}_fts_insert AFTER INSERT ON "{name}" BEGIN
+                INSERT INTO {name}_fts(rowid, name) VALUES (new.id, new.name);
+            END""")
+            op.execute(f"""CREATE TRIGGER {name}_fts_delete AFTER DELETE ON "{name}" BEGIN
+                INSERT INTO {name}_fts({name}_fts, rowid, name) VALUES ('delete', old.id, old.name);
+            END""")
+            op.execute(f"""CREATE TRIGGER {name}_fts_update AFTER UPDATE OF name ON "{name}" BEGIN
+                INSERT INTO {name}_fts({name}_fts, rowid, name) VALUES ('delete', old.id, old.name);
+                INSERT INTO {name}_fts(rowid, name) VALUES (new.id, new.name);
+            END""")
+    elif dialect == 'postgresql':
+        # GIN indexes are maintained by PostgreSQL on every write.
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for name in SEARCH_TABLES:
+            op.execute(f"CREATE INDEX ix_{name}_name_trgm ON \"{name}\" USING gin (name gin_trgm_ops)")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for name in SEARCH_TABLES:
+            for trigger in ('insert', 'delete', 'update'):
+                op.execute(f"DROP TRIGGER {name}_fts_{trigger}")
+            op.execute(f"DROP TABLE {name}_fts")
+    elif dialect == 'postgresql':
+        for name in SEARCH_TABLES:
+            op.execute(f"DROP INDEX ix_{name}_name_trgm")
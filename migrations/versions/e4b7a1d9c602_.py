@@ -0,0 +1,30 @@
+"""statistic summary table
+
+Revision ID: e4b7a1d9c602
+Revises: c9a0f6e2d4b8
+Create Date: 2026-10-17 17:52:14.304118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7a1d9c602'
+down_revision = 'c9a0f6e2d4b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('statistic',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('bucket', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('name', 'bucket')
+    )
+
+
+def downgrade():
+    op.drop_table('statistic')
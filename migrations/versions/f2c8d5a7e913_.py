@@ -0,0 +1,35 @@
+"""favorite counters for the most favorited leaderboard
+
+Revision ID: f2c8d5a7e913
+Revises: e4b7a1d9c602
+Create Date: 2026-10-17 18:24:51.662930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c8d5a7e913'
+down_revision = 'e4b7a1d9c602'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('favorite_count',
+    sa.Column('entity_type_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('entity_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['entity_type_id'], ['entity.id'], ),
+    sa.PrimaryKeyConstraint('entity_type_id', 'entity_id')
+    )
+    op.create_index('ix_favorite_count_rank', 'favorite_count', ['entity_type_id', 'total', 'entity_id'], unique=False)
+    # Backfill from the existing favorites.
+    op.execute("""INSERT INTO favorite_count (entity_type_id, entity_id, total)
+        SELECT entity_type_id, entity_id, COUNT(*) FROM favorite GROUP BY entity_type_id, entity_id""")
+
+
+def downgrade():
+    op.drop_index('ix_favorite_count_rank', table_name='favorite_count')
+    op.drop_table('favorite_count')
@@ -2,16 +2,26 @@ import os
 from flask_admin import Admin
 from models import db, Character, Color, Entity, Favorite, Gender, Planet, User
 from flask_admin.contrib.sqla import ModelView
+from versions import bump
+
+class VersionedModelView(ModelView):
+    # Called before the admin commits, so its writes move the table version
+    # like the API's and conditional GETs see them.
+    def on_model_change(self, form, model, is_created):
+        bump(self.model)
+
+    def on_model_delete(self, model):
+        bump(self.model)
 
 def setup_admin(app):
     app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
     app.config['FLASK_ADMIN_SWATCH'] = 'cerulean'
     admin = Admin(app, name='4Geeks Admin', template_mode='bootstrap3')
 
-    admin.add_view(ModelView(Character, db.session))
-    admin.add_view(ModelView(Color, db.session))
-    admin.add_view(ModelView(Entity, db.session))
-    admin.add_view(ModelView(Favorite, db.session))
-    admin.add_view(ModelView(Gender, db.session))
-    admin.add_view(ModelView(Planet, db.session))
-    admin.add_view(ModelView(User, db.session))
+    admin.add_view(VersionedModelView(Character, db.session))
+    admin.add_view(VersionedModelView(Color, db.session))
+    admin.add_view(VersionedModelView(Entity, db.session))
+    admin.add_view(VersionedModelView(Favorite, db.session))
+    admin.add_view(VersionedModelView(Gender, db.session))
+    admin.add_view(VersionedModelView(Planet, db.session))
+    admin.add_view(VersionedModelView(User, db.session))
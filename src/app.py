@@ -1,25 +1,140 @@
 import os
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, current_app, request, jsonify, stream_with_context
 from flask_migrate import Migrate
 from flask_cors import CORS
-from utils import generate_sitemap, validate_character, validate_color, validate_gender, validate_planet
-from admin import setup_admin
+from sqlalchemy import and_, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from werkzeug.local import LocalProxy
+from werkzeug.middleware.proxy_fix import ProxyFix
+from utils import DEFAULT_PAGE_SIZE, DEFAULT_TOP_SIZE, MAX_BATCH_SIZE, MAX_FAVORITES_BATCH_SIZE, decode_cursor, encode_cursor, generate_sitemap, validate_character, validate_color, validate_expand, validate_favorite, validate_filters, validate_flag, validate_gender, validate_ids, validate_pagination, validate_planet, validate_search, validate_sort, validate_top
+from commands import insert_ignoring_conflicts, setup_commands
+from limits import setup_limits
+from compression import setup_compression
+from metrics import setup_metrics
+from replicas import setup_replicas
+from cache import LookupCache
+from response_cache import ResponseCache, cached, row_tag, table_tag
+from registry import EntityRegistry
+from search import search_query
+from stats import character_deltas, character_stats, count_favorites, favorite_deltas, favorite_stats, forget_favorites, planet_deltas, planet_stats, rebuild_favorite_counts, record, refresh, stats_cache, StatsCache, summary_enabled, top_favorited
+from projection import projection_for
+from conditional import conditional
+from versions import bump, table_versions
 from models import db, Character, Color, Entity, Favorite, Gender, Planet, User
 
-app = Flask(__name__)
-app.url_map.strict_slashes = False
+CHARACTER_REFERENCES = {
+    "homeworld_id": Planet,
+    "eye_color_id": Color,
+    "hair_color_id": Color,
+    "skin_color_id": Color,
+    "gender_id": Gender
+}
+CHARACTER_EXPANSIONS = ("homeworld", "eye_color", "hair_color", "skin_color", "gender")
+FAVORITE_EXPANSIONS = ("entity_type",)
+CHARACTER_FILTERS = ("homeworld_id", "gender_id", "eye_color_id", "hair_color_id", "skin_color_id")
+CHARACTER_RANGES = ("height", "mass")
+CHARACTER_SORTS = ("id", "name", "height", "mass")
+PLANET_RANGES = ("population", "diameter", "gravity")
+PLANET_SORTS = ("id", "name", "population", "diameter", "gravity")
+STREAM_CHUNK_SIZE = 1000
+# Full lists, bulk writes and favorites writes spend from the smaller budget.
+EXPENSIVE_ENDPOINTS = ("api.fetch_characters", "api.fetch_planets", "api.fetch_users", "api.fetch_favorites_by_user_id", "api.search", "api.populate_db", "api.create_characters_batch", "api.create_favorite", "api.delete_favorite", "api.create_favorites_batch", "api.delete_favorites_batch", "api.delete_characters_batch", "api.delete_planets_batch", "api.delete_colors_batch", "api.delete_genders_batch")
+LOOKUP_ENDPOINTS = ("api.fetch_colors", "api.fetch_color_by_id", "api.fetch_genders", "api.fetch_gender_by_id", "api.fetch_entities", "api.fetch_entity_by_id")
 
-db_url = os.getenv("DATABASE_URL")
-if db_url is not None:
-    app.config['SQLALCHEMY_DATABASE_URI'] = db_url.replace("postgres://", "postgresql://")
-else:
-    app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+STAT_DELTAS = {
+    Character: character_deltas,
+    Planet: planet_deltas
+}
 
-MIGRATE = Migrate(app, db)
-db.init_app(app)
-CORS(app)
-setup_admin(app)
+# Caches and registries belong to the app in current_app.extensions, so
+# each create_app() call starts with its own; these names resolve to them.
+lookup_caches = LocalProxy(lambda: current_app.extensions["lookup_caches"])
+color_cache = LocalProxy(lambda: current_app.extensions["lookup_caches"][Color])
+gender_cache = LocalProxy(lambda: current_app.extensions["lookup_caches"][Gender])
+entity_cache = LocalProxy(lambda: current_app.extensions["lookup_caches"][Entity])
+response_cache = LocalProxy(lambda: current_app.extensions["response_cache"])
+entity_registry = LocalProxy(lambda: current_app.extensions["entity_registry"])
+
+MIGRATE = Migrate()
+api = Blueprint("api", __name__)
+
+def load_config():
+    config = dict()
+    db_url = os.getenv("DATABASE_URL")
+    if db_url is not None:
+        config['SQLALCHEMY_DATABASE_URI'] = db_url.replace("postgres://", "postgresql://")
+    else:
+        config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
+    config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Replicas are extra binds named replica_<n>; every bind shares the pool
+    # settings below. SQLite uses a file/singleton pool, which takes none of them.
+    replica_urls = [url.strip().replace("postgres://", "postgresql://") for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+    config['SQLALCHEMY_BINDS'] = { f"replica_{index}": url for index, url in enumerate(replica_urls) }
+    if not config['SQLALCHEMY_DATABASE_URI'].startswith("sqlite"):
+        config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            "pool_size": int(os.getenv("DATABASE_POOL_SIZE", 5)),
+            "max_overflow": int(os.getenv("DATABASE_MAX_OVERFLOW", 10)),
+            "pool_timeout": int(os.getenv("DATABASE_POOL_TIMEOUT", 30)),
+            "pool_recycle": int(os.getenv("DATABASE_POOL_RECYCLE", 1800)),
+            "pool_pre_ping": True
+        }
+    # By default no more requests run DB-bound handlers than the pool has
+    # connections; 0 turns the cap off (the default on SQLite).
+    pool_options = config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    config['MAX_CONCURRENT_DB_REQUESTS'] = int(os.getenv("MAX_CONCURRENT_DB_REQUESTS", pool_options.get("pool_size", 0) + pool_options.get("max_overflow", 0)))
+    config['ADMISSION_TIMEOUT'] = float(os.getenv("ADMISSION_TIMEOUT", 0.1))
+    config['RATE_LIMIT_ENABLED'] = os.getenv("RATE_LIMIT_ENABLED", "1").lower() in ("1", "true", "yes")
+    config['RATE_LIMIT_CHEAP_RATE'] = float(os.getenv("RATE_LIMIT_CHEAP_RATE", 20))
+    config['RATE_LIMIT_CHEAP_BURST'] = float(os.getenv("RATE_LIMIT_CHEAP_BURST", 40))
+    config['RATE_LIMIT_EXPENSIVE_RATE'] = float(os.getenv("RATE_LIMIT_EXPENSIVE_RATE", 2))
+    config['RATE_LIMIT_EXPENSIVE_BURST'] = float(os.getenv("RATE_LIMIT_EXPENSIVE_BURST", 5))
+    # X-API-Key values that get their own buckets; other requests are
+    # limited by address.
+    config['API_KEYS'] = frozenset(key.strip() for key in os.getenv("API_KEYS", "").split(",") if key.strip())
+    # Proxies in front of the app that append to X-Forwarded-For; 0 trusts
+    # none and limits by the socket's address.
+    config['PROXY_FIX_HOPS'] = int(os.getenv("PROXY_FIX_HOPS", 0))
+    config['RESPONSE_CACHE_URL'] = os.getenv("RESPONSE_CACHE_URL", "")
+    config['RESPONSE_CACHE_TTL'] = int(os.getenv("RESPONSE_CACHE_TTL", 60))
+    config['RESPONSE_CACHE_MAX_BYTES'] = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    # Keep /stats in summary rows updated by the write handlers instead of
+    # aggregating the base tables; run `flask rebuild-stats` after enabling it.
+    config['STATS_SUMMARY'] = os.getenv("STATS_SUMMARY", "").lower() in ("1", "true", "yes")
+    config['COMPRESSION_MIN_SIZE'] = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+    # API-only workers skip Flask-Admin entirely: it is never imported.
+    config['API_ONLY'] = os.getenv("API_ONLY", "").lower() in ("1", "true", "yes")
+    return config
+
+def create_app(config=None):
+    """Builds the app from the environment; `config` overrides any key."""
+    app = Flask(__name__)
+    app.url_map.strict_slashes = False
+    app.config.from_mapping(load_config())
+    app.config.from_mapping(config or {})
+    if app.config['PROXY_FIX_HOPS'] > 0:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_HOPS'], x_proto=app.config['PROXY_FIX_HOPS'])
+
+    MIGRATE.init_app(app, db)
+    db.init_app(app)
+    CORS(app)
+    if not app.config['API_ONLY']:
+        from admin import setup_admin
+        setup_admin(app)
+    setup_commands(app)
+    setup_metrics(app, lambda: { key or "primary": engine for key, engine in db.engines.items() })
+    setup_limits(app, lambda endpoint: endpoint in EXPENSIVE_ENDPOINTS, lambda endpoint: endpoint.startswith("api.") and endpoint not in ("api.sitemap", "api.fetch_cache_stats"))
+    setup_replicas(app, db, lambda endpoint: endpoint.startswith("api.fetch_") or endpoint == "api.search")
+    ResponseCache(app)
+    app.extensions["lookup_caches"] = { model: LookupCache(model) for model in (Color, Gender, Entity) }
+    app.extensions["entity_registry"] = EntityRegistry()
+    app.extensions["entity_registry"].register("people", Character)
+    app.extensions["entity_registry"].register("planets", Planet)
+    app.extensions["stats_cache"] = StatsCache()
+    app.extensions["compressed_bodies"] = setup_compression(app, lambda endpoint: endpoint in LOOKUP_ENDPOINTS)
+    app.register_blueprint(api)
+    app.extensions["sitemap"] = None
+    return app
 
 class InvalidAPIUsage(Exception):
     status_code = 400
@@ -36,7 +151,353 @@ class InvalidAPIUsage(Exception):
         rv["message"] = self.message
         return rv
 
-@app.route("/populate")
+def get_page_params(allow_stream=False, sort=None):
+    is_valid, errors = validate_pagination(request.args, sort[0] if sort is not None else None)
+    if not is_valid:
+        raise InvalidAPIUsage(
+            message="Bad Request",
+            status_code=400,
+            payload=errors
+        )
+    if sort is not None and "after" in request.args:
+        after = decode_cursor(request.args["after"], sort[0])
+    else:
+        after = request.args.get("after", type=int)
+    if request.args.get("stream") == "1":
+        if not allow_stream:
+            raise InvalidAPIUsage(
+                message="Bad Request",
+                status_code=400,
+                payload={ "stream": "Streaming is not supported for this request" }
+            )
+        return None, after
+    limit = request.args.get("limit", DEFAULT_PAGE_SIZE, type=int)
+    return limit, after
+
+def get_expand_params(allowed):
+    is_valid, errors = validate_expand(request.args, allowed)
+    if not is_valid:
+        raise InvalidAPIUsage(
+            message="Bad Request",
+            status_code=400,
+            payload=errors
+        )
+    return requested_expand(allowed)
+
+def requested_expand(allowed):
+    # Repeats are dropped and the order is fixed, so each relation is joined
+    # once and there is one serializer per combination. Unknown relations
+    # are ignored here; get_expand_params rejects them.
+    expand = request.args.get("expand", "").split(",")
+    return tuple(relation for relation in allowed if relation in expand)
+
+def get_sort_param(allowed):
+    is_valid, errors = validate_sort(request.args, allowed)
+    if not is_valid:
+        raise InvalidAPIUsage(
+            message="Bad Request",
+            status_code=400,
+            payload=errors
+        )
+    sort = request.args.get("sort")
+    if sort is None or sort == "id":
+        return None
+    return sort.removeprefix("-"), sort.startswith("-")
+
+def get_filter_params(equality_keys, range_keys):
+    is_valid, errors = validate_filters(request.args, equality_keys, range_keys)
+    if not is_valid:
+        raise InvalidAPIUsage(
+            message="Bad Request",
+            status_code=400,
+            payload=errors
+        )
+    filters = []
+    for key in equality_keys:
+        if key in request.args:
+            filters.append((key, "eq", int(request.args[key])))
+    for key in range_keys:
+        if f"{key}_min" in request.args:
+            filters.append((key, "min", float(request.args[f"{key}_min"])))
+        if f"{key}_max" in request.args:
+            filters.append((key, "max", float(request.args[f"{key}_max"])))
+    return filters
+
+def apply_filters(query, model, filters):
+    for key, operator, value in filters:
+        column = getattr(model, key)
+        if operator == "eq":
+            query = query.filter(column == value)
+        elif operator == "min":
+            query = query.filter(column >= value)
+        else:
+            query = query.filter(column <= value)
+    return query
+
+def get_search_params():
+    is_valid, errors = validate_search(request.args)
+    if not is_valid:
+        raise InvalidAPIUsage(
+            message="Bad Request",
+            status_code=400,
+            payload=errors
+        )
+    limit, offset = get_page_params()
+    return request.args["q"].strip(), limit, offset or 0
+
+def search_page(query, model, limit, offset, expand=()):
+    # Ranked results page by offset (capped at MAX_SEARCH_DEPTH): the rank is
+    # computed by the index, so there is no stable column to seek on.
+    rows = projection_for(model).query(query, expand).offset(offset).limit(limit + 1).all()
+    next_cursor = offset + limit if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def get_flag_param(key):
+    is_valid, errors = validate_flag(request.args, key)
+    if not is_valid:
+        raise InvalidAPIUsage(
+            message="Bad Request",
+            status_code=400,
+            payload=errors
+        )
+    return request.args.get(key) == "1"
+
+def eager_load(query, model, expand):
+    # Many-to-one relations are joined into the same SELECT, so expanding
+    # any number of them never costs more than one statement per page.
+    for relation in expand:
+        query = query.options(joinedload(getattr(model, relation)))
+    return query
+
+def apply_keyset(query, model, after, sort=None):
+    # Keyset pagination: the index seek replaces a full scan. Sorted pages
+    # seek on (column, id), which the (column, id) indexes serve directly.
+    if sort is None:
+        if after is not None:
+            query = query.filter(model.id > after)
+        return query.order_by(model.id)
+    key, descending = sort
+    column = getattr(model, key)
+    if after is not None:
+        position = tuple_(column, model.id)
+        query = query.filter(position < tuple_(*after) if descending else position > tuple_(*after))
+    if descending:
+        return query.order_by(column.desc(), model.id.desc())
+    return query.order_by(column, model.id)
+
+def fetch_page(query, model, limit, after, sort=None, expand=()):
+    # One extra row tells us whether there is a next page.
+    rows = apply_keyset(projection_for(model).query(query, expand), model, after, sort).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = last.id if sort is None else encode_cursor([getattr(last, sort[0]), last.id])
+    return rows[:limit], next_cursor
+
+def page_response(rows, next_cursor, model, expand=()):
+    return {
+        "results": list(map(projection_for(model).serializer(expand), rows)),
+        "next": next_cursor
+    }
+
+def stream_response(query, model, after, expand=(), sort=None):
+    # Rows come from a server-side cursor in chunks and are encoded one chunk
+    # at a time, so memory stays bounded by STREAM_CHUNK_SIZE, not the table.
+    query = apply_keyset(projection_for(model).query(query, expand), model, after, sort).yield_per(STREAM_CHUNK_SIZE)
+    serialize = projection_for(model).serializer(expand)
+
+    def generate():
+        yield '{"next":null,"results":['
+        chunk = []
+        separator = ""
+        for row in query:
+            chunk.append(current_app.json.dumps(serialize(row), separators=(",", ":")))
+            if len(chunk) == STREAM_CHUNK_SIZE:
+                yield separator + ",".join(chunk)
+                separator = ","
+                chunk = []
+        if chunk:
+            yield separator + ",".join(chunk)
+        yield "]}"
+
+    return current_app.response_class(stream_with_context(generate()), mimetype="application/json")
+
+def hydrate_favorites(favorites, expand=()):
+    # One IN query per entity type, however many favorites are on the page.
+    ids_by_type = dict()
+    for favorite in favorites:
+        ids_by_type.setdefault(favorite.entity_type_id, set()).add(favorite.entity_id)
+    entities = dict()
+    for entity_type_id, ids in ids_by_type.items():
+        entity_type = entity_registry.by_id(entity_type_id)
+        if entity_type is None:
+            continue
+        projection = projection_for(entity_type.model)
+        serialize_entity = projection.serializer()
+        for entity in projection.query(entity_type.model.query.filter(entity_type.model.id.in_(ids))):
+            entities[(entity_type_id, entity.id)] = serialize_entity(entity)
+
+    serialize = projection_for(Favorite).serializer(expand)
+    results = []
+    for favorite in favorites:
+        data = serialize(favorite)
+        data["entity"] = entities.get((favorite.entity_type_id, favorite.entity_id))
+        results.append(data)
+    return results
+
+def character_models(expand):
+    # Expanded rows are embedded, so writes to their tables count too.
+    return [Character] + [CHARACTER_REFERENCES[f"{relation}_id"] for relation in expand]
+
+def favorite_models(expand, hydrate):
+    models = [Favorite] + ([Entity] if "entity_type" in expand else [])
+    # Hydrated bodies embed characters and planets.
+    if hydrate:
+        models += [entity_type.model for entity_type in entity_registry.all()]
+    return models
+
+def character_state(character_id=None):
+    return table_versions(*character_models(requested_expand(CHARACTER_EXPANSIONS)))
+
+def favorites_state(user_id):
+    return table_versions(*favorite_models(requested_expand(FAVORITE_EXPANSIONS), request.args.get("hydrate") == "1"))
+
+def character_tags(character_id=None):
+    tags = [table_tag(Character) if character_id is None else row_tag(Character, character_id)]
+    return tags + [table_tag(model) for model in character_models(requested_expand(CHARACTER_EXPANSIONS))[1:]]
+
+def user_favorites_tag(user_id):
+    return f"{table_tag(Favorite)}:user:{user_id}"
+
+def favorites_tags(user_id):
+    tags = [user_favorites_tag(user_id), row_tag(User, user_id)]
+    if request.args.get("hydrate") == "1":
+        tags += [table_tag(entity_type.model) for entity_type in entity_registry.all()]
+    if "entity_type" in request.args.get("expand", "").split(","):
+        tags.append(table_tag(Entity))
+    return tags
+
+def get_ids_param():
+    is_valid, errors = validate_ids(request.args)
+    if not is_valid:
+        raise InvalidAPIUsage(
+            message="Bad Request",
+            status_code=400,
+            payload=errors
+        )
+    return sorted(set(int(value) for value in request.args["ids"].split(",")))
+
+def delete_favorites_of(model, ids):
+    # Favorite.entity_id has no foreign key, so favorites of deleted rows are
+    # removed here. Returns the ids of the users who lost favorites, one per
+    # deleted favorite.
+    entity_type = entity_registry.by_model(model)
+    if entity_type is None:
+        return []
+    condition = and_(Favorite.entity_type_id == entity_type.id, Favorite.entity_id.in_(ids))
+    statement = Favorite.__table__.delete().where(condition)
+    if db.session.get_bind().dialect.name == "postgresql":
+        user_ids = db.session.execute(statement.returning(Favorite.user_id)).scalars().all()
+    else:
+        # Locked, so no favorite can be added to the range between the read
+        # and the DELETE where the database supports it.
+        user_ids = db.session.execute(select(Favorite.user_id).where(condition).with_for_update()).scalars().all()
+        db.session.execute(statement)
+    if user_ids:
+        record(favorite_deltas(entity_type.id, -len(user_ids)))
+    forget_favorites(entity_type.id, ids)
+    return user_ids
+
+def delete_by_ids(model, ids):
+    """Deletes rows, and the favorites pointing at them, with one DELETE each
+    in a single transaction; returns the number of rows deleted."""
+    user_ids = delete_favorites_of(model, ids)
+    if model in STAT_DELTAS and summary_enabled():
+        projection = projection_for(model)
+        serialize = projection.serializer()
+        for row in projection.query(model.query.filter(model.id.in_(ids))):
+            record(STAT_DELTAS[model](serialize(row), -1))
+    deleted = db.session.execute(model.__table__.delete().where(model.id.in_(ids))).rowcount
+    if deleted or user_ids:
+        bump(model, *([Favorite] if user_ids else []))
+    db.session.commit()
+    if model in STAT_DELTAS or user_ids:
+        stats_cache.invalidate()
+    if model in lookup_caches:
+        lookup_caches[model].invalidate()
+    if deleted or user_ids:
+        response_cache.invalidate(
+            table_tag(model),
+            *(row_tag(model, row_id) for row_id in ids),
+            *([table_tag(Favorite)] if user_ids else []),
+            *(user_favorites_tag(user_id) for user_id in set(user_ids))
+        )
+    return deleted
+
+def add_favorites(user_id, entity_type, ids):
+    """Inserts the favorites that do not exist yet; returns the entity ids
+    the database actually inserted. A pair sent by two concurrent requests
+    is inserted, and so counted, by only one of them."""
+    rows = [{ "user_id": user_id, "entity_type_id": entity_type.id, "entity_id": entity_id } for entity_id in sorted(ids)]
+    keys = ["user_id", "entity_type_id", "entity_id"]
+    if db.session.get_bind().dialect.name == "postgresql":
+        statement = insert_ignoring_conflicts(Favorite.__table__, rows, keys).returning(Favorite.entity_id)
+        return db.session.execute(statement).scalars().all()
+    # Without RETURNING, one INSERT per row: its rowcount tells whether the
+    # row was inserted or already there.
+    return [row["entity_id"] for row in rows if db.session.execute(insert_ignoring_conflicts(Favorite.__table__, [row], keys)).rowcount]
+
+def remove_favorites(user_id, entity_type, ids):
+    """Deletes the favorites among ids; returns the entity ids the database
+    actually deleted, so concurrent deletes of a pair count it once."""
+    condition = and_(Favorite.user_id == user_id, Favorite.entity_type_id == entity_type.id)
+    if db.session.get_bind().dialect.name == "postgresql":
+        statement = Favorite.__table__.delete().where(condition, Favorite.entity_id.in_(ids)).returning(Favorite.entity_id)
+        return db.session.execute(statement).scalars().all()
+    return [
+        entity_id for entity_id in sorted(ids)
+        if db.session.execute(Favorite.__table__.delete().where(condition, Favorite.entity_id == entity_id)).rowcount
+    ]
+
+def get_favorite_pairs():
+    data = request.json
+    if not isinstance(data, list) or len(data) == 0 or len(data) > MAX_FAVORITES_BATCH_SIZE:
+        raise InvalidAPIUsage(
+            message=f"The body should be a list of 1 to {MAX_FAVORITES_BATCH_SIZE} favorites",
+            status_code=400
+        )
+    errors = dict()
+    for index, item in enumerate(data):
+        is_valid, item_errors = validate_favorite(item) if isinstance(item, dict) else (False, { "item": "The favorite should be an object" })
+        if not is_valid:
+            errors[index] = item_errors
+    if errors:
+        raise InvalidAPIUsage(
+            message="Unprocessable Entity",
+            status_code=422,
+            payload={ "errors": errors }
+        )
+    return data
+
+def resolve_favorite_pairs(data):
+    # Returns { entity type: set of ids } and the errors of unknown types.
+    ids_by_type = dict()
+    errors = dict()
+    for index, item in enumerate(data):
+        entity_type = entity_registry.by_path(item["type"])
+        if entity_type is None:
+            errors[index] = { "type": f"Entity type {item['type']} not found." }
+            continue
+        ids_by_type.setdefault(entity_type, set()).add(item["id"])
+    return ids_by_type, errors
+
+def collection_response(query, model, limit, after, expand=(), sort=None):
+    if limit is None:
+        return stream_response(query, model, after, expand, sort)
+    rows, next_cursor = fetch_page(query, model, limit, after, sort, expand)
+    return jsonify(page_response(rows, next_cursor, model, expand))
+
+@api.route("/populate")
 def populate_db():
     try:
         manuel = User(
@@ -173,57 +634,124 @@ def populate_db():
         db.session.add(astrid_luke)
         db.session.add(frank_tatooine)
         db.session.commit()
+        for cache in lookup_caches.values():
+            cache.invalidate()
+        entity_registry.invalidate()
+        refresh()
+        rebuild_favorite_counts()
+        bump(User, Planet, Color, Gender, Character, Entity, Favorite)
+        db.session.commit()
+        stats_cache.invalidate()
+        response_cache.clear()
 
         return (""), 204
     except Exception as e:
         return jsonify({ "message": str(e) }), 500
 
-@app.errorhandler(InvalidAPIUsage)
+@api.app_errorhandler(InvalidAPIUsage)
 def invalid_api_usage(e):
     return jsonify(e.to_dict()), e.status_code
 
 # generate sitemap with all your endpoints
-@app.route('/')
+@api.route('/')
 def sitemap():
-    return generate_sitemap(app)
+    # The url map is fixed once the app is built, so the page is rendered once.
+    if current_app.extensions["sitemap"] is None:
+        current_app.extensions["sitemap"] = generate_sitemap(current_app)
+    return current_app.extensions["sitemap"]
+
+@api.route("/cache/stats")
+def fetch_cache_stats():
+    return jsonify({
+        "responses": response_cache.stats(),
+        "compressed_bodies": current_app.extensions["compressed_bodies"].stats(),
+        "colors": color_cache.stats(),
+        "genders": gender_cache.stats(),
+        "entities": entity_cache.stats()
+    }), 200
 
-@app.route("/entities")
+@api.route("/stats/planets")
+@cached(lambda: [table_tag(Planet)])
+def fetch_planet_stats():
+    try:
+        return jsonify(stats_cache.get("planets", planet_stats)), 200
+    except Exception as e:
+        return jsonify({ "message": str(e) }), 500
+
+@api.route("/stats/people")
+@cached(lambda: [table_tag(Character)])
+def fetch_character_stats():
+    try:
+        return jsonify(stats_cache.get("people", character_stats)), 200
+    except Exception as e:
+        return jsonify({ "message": str(e) }), 500
+
+@api.route("/stats/favorites")
+@cached(lambda: [table_tag(Favorite)])
+def fetch_favorite_stats():
+    try:
+        return jsonify(stats_cache.get("favorites", favorite_stats)), 200
+    except Exception as e:
+        return jsonify({ "message": str(e) }), 500
+
+@api.route("/search")
+@cached(lambda: [table_tag(Character), table_tag(Planet)])
+@conditional(lambda: table_versions(Character, Planet))
+def search():
+    q, limit, offset = get_search_params()
+    try:
+        characters, next_characters = search_page(search_query(Character, q), Character, limit, offset)
+        planets, next_planets = search_page(search_query(Planet, q), Planet, limit, offset)
+        return jsonify({
+            "people": page_response(characters, next_characters, Character),
+            "planets": page_response(planets, next_planets, Planet)
+        }), 200
+    except Exception as e:
+        return jsonify({ "message": str(e) }), 500
+
+@api.route("/entities")
+@conditional(lambda: entity_cache.state())
 def fetch_entities():
+    limit, after = get_page_params()
     try:
-        entities = Entity.query.all()
-        return jsonify(list(map(lambda entity: entity.serialize(), entities))), 200
+        entities, next_cursor = entity_cache.page(limit, after)
+        return jsonify({ "results": entities, "next": next_cursor }), 200
     except Exception as e:
         return jsonify({ "message": str(e) }), 500
 
-@app.route("/entities/<int:entity_id>")
+@api.route("/entities/<int:entity_id>")
+@conditional(lambda entity_id: entity_cache.state())
 def fetch_entity_by_id(entity_id):
     try:
-        entity = Entity.query.get(entity_id)
+        entity = entity_cache.get(entity_id)
         if entity is None:
             return jsonify({ "message": f"Entity with ID {entity_id} not found." }), 404
-        return jsonify(entity.serialize()), 200
+        return jsonify(entity), 200
     except Exception as e:
         return jsonify({ "message": str(e) }), 500
 
-@app.route("/genders")
+@api.route("/genders")
+@conditional(lambda: gender_cache.state())
 def fetch_genders():
+    limit, after = get_page_params()
     try:
-        genders = Gender.query.all()
-        return jsonify(list(map(lambda gender: gender.serialize(), genders))), 200
+        genders, next_cursor = gender_cache.page(limit, after)
+        return jsonify({ "results": genders, "next": next_cursor }), 200
     except Exception as e:
         return jsonify({ "message": str(e) }), 500
 
-@app.route("/genders/<int:gender_id>")
+@api.route("/genders/<int:gender_id>")
+@conditional(lambda gender_id: gender_cache.state())
 def fetch_gender_by_id(gender_id):
     try:
-        gender = Gender.query.get(gender_id)
+        gender = gender_cache.get(gender_id)
         if gender is None:
             return jsonify({ "message": f"Gender with ID {gender_id} not found." }), 404
-        return jsonify(gender.serialize()), 200
+        return jsonify(gender), 200
     except Exception as e:
         return jsonify({ "message": str(e) }), 500
 
-@app.route("/genders", methods=["POST"])
+@api.route("/genders", methods=["POST"])
 def create_gender():
     data = request.json
     is_valid, errors = validate_gender(data)
@@ -236,41 +764,54 @@ def create_gender():
     try:
         new_gender = Gender(name=data["name"])
         db.session.add(new_gender)
+        bump(Gender)
         db.session.commit()
+        gender_cache.invalidate()
+        response_cache.invalidate(table_tag(Gender))
         return jsonify(new_gender.serialize()), 201
     except Exception as e:
         return jsonify({ "message": str(e) }), 500
 
-@app.route("/genders/<int:gender_id>", methods=["DELETE"])
+@api.route("/genders/<int:gender_id>", methods=["DELETE"])
 def delete_gender(gender_id):
     try:
-        gender = Gender.query.get(gender_id)
-        if gender is not None:
-            db.session.delete(gender)
-            db.session.commit()
+        delete_by_ids(Gender, [gender_id])
         return (""), 204
     except Exception as e:
+        db.session.rollback()
         return jsonify({ "message": str(e) }), 500
 
-@app.route("/colors")
+@api.route("/genders", methods=["DELETE"])
+def delete_genders_batch():
+    ids = get_ids_param()
+    try:
+        return jsonify({ "deleted": delete_by_ids(Gender, ids) }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({ "message": str(e) }), 500
+
+@api.route("/colors")
+@conditional(lambda: color_cache.state())
 def fetch_colors():
+    limit, after = get_page_params()
     try:
-        colors = Color.query.all()
-        return jsonify(list(map(lambda color: color.serialize(), colors))), 200
+        colors, next_cursor = color_cache.page(limit, after)
+        return jsonify({ "results": colors, "next": next_cursor }), 200
     except Exception as e:
         return jsonify({ "message": str(e) }), 500
 
-@app.route("/colors/<int:color_id>")
+@api.route("/colors/<int:color_id>")
+@conditional(lambda color_id: color_cache.state())
 def fetch_color_by_id(color_id):
     try:
-        color = Color.query.get(color_id)
+        color = color_cache.get(color_id)
         if color is None:
             return jsonify({ "message": f"Color with ID {color_id} not found." }), 404
-        return jsonify(color.serialize()), 200
+        return jsonify(color), 200
     except Exception as e:
         return jsonify({ "message": str(e) }), 500
 
-@app.route("/colors", methods=["POST"])
+@api.route("/colors", methods=["POST"])
 def create_color():
     data = request.json
     is_valid, errors = validate_color(data)
@@ -283,41 +824,73 @@ def create_color():
     try:
         new_color = Color(name=data["name"])
         db.session.add(new_color)
+        bump(Color)
         db.session.commit()
+        color_cache.invalidate()
+        response_cache.invalidate(table_tag(Color))
         return jsonify(new_color.serialize()), 201
     except Exception as e:
         return jsonify({ "message": str(e) }), 500
 
-@app.route("/colors/<int:color_id>", methods=["DELETE"])
+@api.route("/colors/<int:color_id>", methods=["DELETE"])
 def delete_color(color_id):
     try:
-        color = Color.query.get(color_id)
-        if color is not None:
-            db.session.delete(color)
-            db.session.commit()
+        delete_by_ids(Color, [color_id])
         return (""), 204
     except Exception as e:
+        db.session.rollback()
         return jsonify({ "message": str(e) }), 500
 
-@app.route("/people")
+@api.route("/colors", methods=["DELETE"])
+def delete_colors_batch():
+    ids = get_ids_param()
+    try:
+        return jsonify({ "deleted": delete_by_ids(Color, ids) }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({ "message": str(e) }), 500
+
+@api.route("/people")
+@cached(character_tags)
+@conditional(character_state)
 def fetch_characters():
+    if "q" in request.args:
+        return search_characters()
+    sort = get_sort_param(CHARACTER_SORTS)
+    limit, after = get_page_params(allow_stream=True, sort=sort)
+    expand = get_expand_params(CHARACTER_EXPANSIONS)
+    filters = get_filter_params(CHARACTER_FILTERS, CHARACTER_RANGES)
     try:
-        characters = Character.query.all()
-        return jsonify(list(map(lambda character: character.serialize(), characters))), 200
+        query = apply_filters(Character.query, Character, filters)
+        return collection_response(query, Character, limit, after, expand, sort), 200
     except Exception as e:
         return jsonify({ "message": str(e) }), 500
 
-@app.route("/people/<int:character_id>")
+def search_characters():
+    q, limit, offset = get_search_params()
+    expand = get_expand_params(CHARACTER_EXPANSIONS)
+    filters = get_filter_params(CHARACTER_FILTERS, CHARACTER_RANGES)
+    try:
+        query = apply_filters(search_query(Character, q), Character, filters)
+        characters, next_cursor = search_page(query, Character, limit, offset, expand)
+        return jsonify(page_response(characters, next_cursor, Character, expand)), 200
+    except Exception as e:
+        return jsonify({ "message": str(e) }), 500
+
+@api.route("/people/<int:character_id>")
+@cached(character_tags)
+@conditional(character_state)
 def fetch_character_by_id(character_id):
+    expand = get_expand_params(CHARACTER_EXPANSIONS)
     try:
-        character = Character.query.get(character_id)
+        character = eager_load(Character.query, Character, expand).get(character_id)
         if character is None:
             return jsonify({ "message": f"Character with ID {character_id} not found." }), 404
-        return jsonify(character.serialize()), 200
+        return jsonify(character.serialize(expand)), 200
     except Exception as e:
         return jsonify({ "message": str(e) }), 500
 
-@app.route("/people", methods=["POST"])
+@api.route("/people", methods=["POST"])
 def create_character():
     data = request.json
     is_valid, errors = validate_character(data)
@@ -336,26 +909,22 @@ def create_character():
 
         eye_color_id = data.get("eye_color_id")
         if eye_color_id is not None:
-            eye_color = Color.query.get(eye_color_id)
-            if eye_color is None:
+            if not color_cache.has(eye_color_id):
                 return jsonify({ "message": f"Color with ID {eye_color_id} not found." }), 404
 
         hair_color_id = data.get("hair_color_id")
         if hair_color_id is not None:
-            hair_color = Color.query.get(hair_color_id)
-            if hair_color is None:
+            if not color_cache.has(hair_color_id):
                 return jsonify({ "message": f"Color with ID {hair_color_id} not found." }), 404
         
         skin_color_id=data.get("skin_color_id")
         if skin_color_id is not None:
-            skin_color = Color.query.get(skin_color_id)
-            if skin_color is None:
+            if not color_cache.has(skin_color_id):
                 return jsonify({ "message": f"Color with ID {skin_color_id} not found." }), 404
         
         gender_id = data.get("gender_id")
         if gender_id is not None:
-            gender = Gender.query.get(gender_id)
-            if gender is None:
+            if not gender_cache.has(gender_id):
                 return jsonify({ "message": f"Gender with ID {gender_id} not found." }), 404
 
         new_character = Character(
@@ -370,31 +939,128 @@ def create_character():
             mass=data["mass"]
         )
         db.session.add(new_character)
+        record(character_deltas(new_character.serialize(), 1))
+        bump(Character)
         db.session.commit()
+        stats_cache.invalidate()
+        response_cache.invalidate(table_tag(Character))
         return jsonify(new_character.serialize()), 201
     except Exception as e:
         return jsonify({ "message": str(e) }), 500
 
-@app.route("/people/<int:character_id>", methods=["DELETE"])
+@api.route("/people/batch", methods=["POST"])
+def create_characters_batch():
+    data = request.json
+    if not isinstance(data, list) or len(data) == 0 or len(data) > MAX_BATCH_SIZE:
+        raise InvalidAPIUsage(
+            message=f"The body should be a list of 1 to {MAX_BATCH_SIZE} characters",
+            status_code=400
+        )
+
+    errors = dict()
+    for index, item in enumerate(data):
+        is_valid, item_errors = validate_character(item) if isinstance(item, dict) else (False, { "item": "The character should be an object" })
+        if not is_valid:
+            errors[index] = item_errors
+    if errors:
+        raise InvalidAPIUsage(
+            message="Unprocessable Entity",
+            status_code=422,
+            payload={ "errors": errors }
+        )
+
+    try:
+        # Resolve every referenced id with a single IN query per table.
+        referenced_ids = dict()
+        for key, model in CHARACTER_REFERENCES.items():
+            ids = referenced_ids.setdefault(model, set())
+            ids.update(item[key] for item in data if item.get(key) is not None)
+        existing_ids = dict()
+        for model, ids in referenced_ids.items():
+            if model in lookup_caches:
+                existing_ids[model] = set(row_id for row_id in ids if lookup_caches[model].has(row_id))
+                continue
+            rows = db.session.query(model.id).filter(model.id.in_(ids)).all() if ids else []
+            existing_ids[model] = set(row.id for row in rows)
+
+        for index, item in enumerate(data):
+            for key, model in CHARACTER_REFERENCES.items():
+                value = item.get(key)
+                if value is not None and value not in existing_ids[model]:
+                    errors.setdefault(index, dict())[key] = f"{model.__name__} with ID {value} not found."
+        if errors:
+            return jsonify({ "message": "Not Found", "errors": errors }), 404
+
+        db.session.execute(Character.__table__.insert(), [
+            {
+                "homeworld_id": item.get("homeworld_id"),
+                "eye_color_id": item.get("eye_color_id"),
+                "hair_color_id": item.get("hair_color_id"),
+                "skin_color_id": item.get("skin_color_id"),
+                "gender_id": item.get("gender_id"),
+                "name": item["name"],
+                "birth_year": item.get("birth_year"),
+                "height": item["height"],
+                "mass": item["mass"]
+            }
+            for item in data
+        ])
+        record([delta for item in data for delta in character_deltas(item, 1)])
+        bump(Character)
+        db.session.commit()
+        stats_cache.invalidate()
+        response_cache.invalidate(table_tag(Character))
+        return jsonify({ "created": len(data) }), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({ "message": str(e) }), 500
+
+@api.route("/people/<int:character_id>", methods=["DELETE"])
 def delete_character(character_id):
     try:
-        character = Character.query.get(character_id)
-        if character is not None:
-            db.session.delete(character)
-            db.session.commit()
+        delete_by_ids(Character, [character_id])
         return (""), 204
     except Exception as e:
+        db.session.rollback()
         return jsonify({ "message": str(e) }), 500
 
-@app.route("/planets")
+@api.route("/people", methods=["DELETE"])
+def delete_characters_batch():
+    ids = get_ids_param()
+    try:
+        return jsonify({ "deleted": delete_by_ids(Character, ids) }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({ "message": str(e) }), 500
+
+@api.route("/planets")
+@cached(lambda: [table_tag(Planet)])
+@conditional(lambda: table_versions(Planet))
 def fetch_planets():
+    if "q" in request.args:
+        return search_planets()
+    sort = get_sort_param(PLANET_SORTS)
+    limit, after = get_page_params(allow_stream=True, sort=sort)
+    filters = get_filter_params((), PLANET_RANGES)
+    try:
+        query = apply_filters(Planet.query, Planet, filters)
+        return collection_response(query, Planet, limit, after, sort=sort), 200
+    except Exception as e:
+        return jsonify({ "message": str(e) }), 500
+
+def search_planets():
+    q, limit, offset = get_search_params()
+    filters = get_filter_params((), PLANET_RANGES)
     try:
-        planets = Planet.query.all()
-        return jsonify(list(map(lambda planet: planet.serialize(), planets))), 200
+        query = apply_filters(search_query(Planet, q), Planet, filters)
+        planets, next_cursor = search_page(query, Planet, limit, offset)
+        return jsonify(page_response(planets, next_cursor, Planet)), 200
     except Exception as e:
         return jsonify({ "message": str(e) }), 500
 
-@app.route("/planets/<int:planet_id>")
+@api.route("/planets/<int:planet_id>")
+@cached(lambda planet_id: [row_tag(Planet, planet_id)])
+@conditional(lambda planet_id: table_versions(Planet))
 def fetch_planet_by_id(planet_id):
     try:
         planet = Planet.query.get(planet_id)
@@ -404,7 +1070,7 @@ def fetch_planet_by_id(planet_id):
     except Exception as e:
         return jsonify({ "message": str(e) }), 500
 
-@app.route("/planets", methods=["POST"])
+@api.route("/planets", methods=["POST"])
 def create_planet():
     data = request.json
     is_valid, errors = validate_planet(data)
@@ -425,31 +1091,46 @@ def create_planet():
             surface_water=data["surface_water"]
         )
         db.session.add(new_planet)
+        record(planet_deltas(new_planet.serialize(), 1))
+        bump(Planet)
         db.session.commit()
+        stats_cache.invalidate()
+        response_cache.invalidate(table_tag(Planet))
         return jsonify(new_planet.serialize()), 201
     except Exception as e:
         return jsonify({ "message": str(e) }), 500
 
-@app.route("/planets/<int:planet_id>", methods=["DELETE"])
+@api.route("/planets/<int:planet_id>", methods=["DELETE"])
 def delete_planet(planet_id):
     try:
-        planet = Planet.query.get(planet_id)
-        if planet is not None:
-            db.session.delete(planet)
-            db.session.commit()
+        delete_by_ids(Planet, [planet_id])
         return (""), 204
     except Exception as e:
+        db.session.rollback()
+        return jsonify({ "message": str(e) }), 500
+
+@api.route("/planets", methods=["DELETE"])
+def delete_planets_batch():
+    ids = get_ids_param()
+    try:
+        return jsonify({ "deleted": delete_by_ids(Planet, ids) }), 200
+    except Exception as e:
+        db.session.rollback()
         return jsonify({ "message": str(e) }), 500
 
-@app.route("/users")
+@api.route("/users")
+@cached(lambda: [table_tag(User)])
+@conditional(lambda: table_versions(User))
 def fetch_users():
+    limit, after = get_page_params(allow_stream=True)
     try:
-        users = User.query.all()
-        return jsonify(list(map(lambda user: user.serialize(), users))), 200
+        return collection_response(User.query, User, limit, after), 200
     except Exception as e:
         return jsonify({ "message": str(e) }), 500
 
-@app.route("/users/<int:user_id>")
+@api.route("/users/<int:user_id>")
+@cached(lambda user_id: [row_tag(User, user_id)])
+@conditional(lambda user_id: table_versions(User))
 def fetch_user_by_id(user_id):
     try:
         user = User.query.get(user_id)
@@ -459,36 +1140,63 @@ def fetch_user_by_id(user_id):
     except Exception as e:
         return jsonify({ "message": str(e) }), 500
 
-@app.route("/favorites/<int:user_id>")
+@api.route("/favorites/<int:user_id>")
+@cached(favorites_tags)
+@conditional(favorites_state)
 def fetch_favorites_by_user_id(user_id):
+    hydrate = get_flag_param("hydrate")
+    limit, after = get_page_params(allow_stream=not hydrate)
+    expand = get_expand_params(FAVORITE_EXPANSIONS)
     try:
         user = User.query.get(user_id)
         if user is None:
             return jsonify({ "message": f"User with ID {user_id} not found." }), 404
-        favorites = Favorite.query.filter_by(user_id=user_id)
-        return jsonify(list(map(lambda favorite: favorite.serialize(), favorites))), 200
+        if hydrate:
+            favorites, next_cursor = fetch_page(Favorite.query.filter_by(user_id=user_id), Favorite, limit, after, expand=expand)
+            return jsonify({ "results": hydrate_favorites(favorites, expand), "next": next_cursor }), 200
+        return collection_response(Favorite.query.filter_by(user_id=user_id), Favorite, limit, after, expand), 200
     except Exception as e:
         return jsonify({ "message": str(e) }), 500
 
 
-@app.route("/favorites/<int:user_id>/<string:entity_type_param>/<int:entity_id>", methods=["POST"])
+@api.route("/favorites/top")
+@cached(lambda: [table_tag(Favorite)] + [table_tag(entity_type.model) for entity_type in entity_registry.all()])
+def fetch_top_favorites():
+    is_valid, errors = validate_top(request.args)
+    if not is_valid:
+        raise InvalidAPIUsage(
+            message="Bad Request",
+            status_code=400,
+            payload=errors
+        )
+    limit = request.args.get("limit", DEFAULT_TOP_SIZE, type=int)
+    try:
+        entity_type = entity_registry.by_path(request.args["type"])
+        if entity_type is None:
+            return jsonify({ "message": f"Entity type {request.args['type']} not found." }), 404
+        counts = top_favorited(entity_type.id, limit)
+        projection = projection_for(entity_type.model)
+        serialize = projection.serializer()
+        ids = [row.entity_id for row in counts]
+        entities = { row.id: serialize(row) for row in projection.query(entity_type.model.query.filter(entity_type.model.id.in_(ids))) } if ids else {}
+        return jsonify({
+            "results": [{ "entity": entities.get(row.entity_id), "favorites": row.total } for row in counts]
+        }), 200
+    except Exception as e:
+        return jsonify({ "message": str(e) }), 500
+
+@api.route("/favorites/<int:user_id>/<string:entity_type_param>/<int:entity_id>", methods=["POST"])
 def create_favorite(user_id, entity_type_param, entity_id):
     try:
         user = User.query.get(user_id)
         if user is None:
             return jsonify({ "message": f"User with ID {user_id} not found." }), 404
         
-        entity_type = Entity.query.filter_by(path=entity_type_param).one_or_none()
+        entity_type = entity_registry.by_path(entity_type_param)
         if entity_type is None:
             return jsonify({ "message": f"Entity type {entity_type_param} not found." }), 404
         
-        entity = None
-        if entity_type.path == "people":
-            entity = Character.query.get(entity_id)
-        elif entity_type.path == "planets":
-            entity = Planet.query.get(entity_id)
-        
-        if entity is None:
+        if not entity_type.exists(entity_id):
             return jsonify({ "message": f"Entity with ID {entity_id} not found." }), 404
         
         new_favorite = Favorite(
@@ -497,40 +1205,105 @@ def create_favorite(user_id, entity_type_param, entity_id):
             entity_id=entity_id
         )
         db.session.add(new_favorite)
+        record(favorite_deltas(entity_type.id, 1))
+        count_favorites(entity_type.id, [entity_id], 1)
+        bump(Favorite)
         db.session.commit()
+        stats_cache.invalidate()
+        response_cache.invalidate(table_tag(Favorite), user_favorites_tag(user_id))
         return jsonify(new_favorite.serialize()), 201
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({ "message": f"Entity with ID {entity_id} is already a favorite." }), 409
     except Exception as e:
         return jsonify({ "message": str(e) }), 500
 
-@app.route("/favorites/<int:user_id>/<string:entity_type_param>/<int:entity_id>", methods=["DELETE"])
+@api.route("/favorites/<int:user_id>", methods=["POST"])
+def create_favorites_batch(user_id):
+    data = get_favorite_pairs()
+    try:
+        user = User.query.get(user_id)
+        if user is None:
+            return jsonify({ "message": f"User with ID {user_id} not found." }), 404
+
+        # One IN query per entity type, however many favorites are sent.
+        ids_by_type, errors = resolve_favorite_pairs(data)
+        existing_ids = { entity_type: entity_type.existing_ids(ids) for entity_type, ids in ids_by_type.items() }
+        for index, item in enumerate(data):
+            entity_type = entity_registry.by_path(item["type"])
+            if entity_type is not None and item["id"] not in existing_ids[entity_type]:
+                errors[index] = { "id": f"Entity with ID {item['id']} not found." }
+        if errors:
+            return jsonify({ "message": "Not Found", "errors": errors }), 404
+
+        # One INSERT per entity type; the counters only count what it added.
+        created = 0
+        for entity_type, ids in ids_by_type.items():
+            inserted_ids = add_favorites(user_id, entity_type, ids)
+            record(favorite_deltas(entity_type.id, len(inserted_ids)))
+            count_favorites(entity_type.id, inserted_ids, 1)
+            created += len(inserted_ids)
+        if created:
+            bump(Favorite)
+        db.session.commit()
+        stats_cache.invalidate()
+        response_cache.invalidate(table_tag(Favorite), user_favorites_tag(user_id))
+        return jsonify({ "created": created, "skipped": len(data) - created }), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({ "message": str(e) }), 500
+
+@api.route("/favorites/<int:user_id>", methods=["DELETE"])
+def delete_favorites_batch(user_id):
+    data = get_favorite_pairs()
+    try:
+        user = User.query.get(user_id)
+        if user is None:
+            return jsonify({ "message": f"User with ID {user_id} not found." }), 404
+
+        ids_by_type, errors = resolve_favorite_pairs(data)
+        if errors:
+            return jsonify({ "message": "Not Found", "errors": errors }), 404
+
+        # One set-based DELETE per entity type; pairs that are not favorites
+        # are simply not matched.
+        deleted = 0
+        for entity_type, ids in ids_by_type.items():
+            removed_ids = remove_favorites(user_id, entity_type, ids)
+            record(favorite_deltas(entity_type.id, -len(removed_ids)))
+            count_favorites(entity_type.id, removed_ids, -1)
+            deleted += len(removed_ids)
+        if deleted:
+            bump(Favorite)
+        db.session.commit()
+        stats_cache.invalidate()
+        response_cache.invalidate(table_tag(Favorite), user_favorites_tag(user_id))
+        return jsonify({ "deleted": deleted }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({ "message": str(e) }), 500
+
+@api.route("/favorites/<int:user_id>/<string:entity_type_param>/<int:entity_id>", methods=["DELETE"])
 def delete_favorite(user_id, entity_type_param, entity_id):
     try:
         user = User.query.get(user_id)
         if user is None:
             return jsonify({ "message": f"User with ID {user_id} not found." }), 404
         
-        entity_type = Entity.query.filter_by(path=entity_type_param).one_or_none()
+        entity_type = entity_registry.by_path(entity_type_param)
         if entity_type is None:
             return jsonify({ "message": f"Entity type {entity_type_param} not found." }), 404
         
-        entity = None
-        if entity_type.path == "people":
-            entity = Character.query.get(entity_id)
-        elif entity_type.path == "planets":
-            entity = Planet.query.get(entity_id)
-        
-        if entity is None:
+        if not entity_type.exists(entity_id):
             return jsonify({ "message": f"Entity with ID {entity_id} not found." }), 404
 
-        favorite = Favorite.query.filter_by(
-            user_id=user_id,
-            entity_type_id=entity_type.id,
-            entity_id=entity_id
-        ).one_or_none()
-
-        if favorite is not None:
-            db.session.delete(favorite)
+        if remove_favorites(user_id, entity_type, [entity_id]):
+            record(favorite_deltas(entity_type.id, -1))
+            count_favorites(entity_type.id, [entity_id], -1)
+            bump(Favorite)
             db.session.commit()
+            stats_cache.invalidate()
+            response_cache.invalidate(table_tag(Favorite), user_favorites_tag(user_id))
         return (""), 204
     except Exception as e:
         return jsonify({ "message": str(e) }), 500
@@ -538,4 +1311,4 @@ def delete_favorite(user_id, entity_type_param, entity_id):
 # this only runs if `$ python src/app.py` is executed
 if __name__ == '__main__':
     PORT = int(os.environ.get('PORT', 3000))
-    app.run(host='0.0.0.0', port=PORT, debug=False)
+    create_app().run(host='0.0.0.0', port=PORT, debug=False)
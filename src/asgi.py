@@ -0,0 +1,196 @@
+# ASGI entry point: `uvicorn asgi:application --app-dir src`.
+# Plain GET reads of people, planets and favorites are served with an async
+# engine, so a slow client no longer pins a worker thread for the whole
+# database round trip. They carry the same ETag and Last-Modified as the
+# Flask views. Every other request (writes, search, filters, conditional
+# GETs, the lookup tables, admin...) goes to the regular Flask app, which
+# stays the WSGI entry point in wsgi.py.
+
+import hashlib
+from urllib.parse import parse_qsl
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import joinedload, sessionmaker
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Match, Route, Router
+from werkzeug.http import http_date as format_http_date, quote_etag
+from app import create_app, character_models, favorite_models, CHARACTER_EXPANSIONS, FAVORITE_EXPANSIONS, InvalidAPIUsage
+from conditional import http_date, is_settled
+from limits import AsyncAdmissionControl, api_client_key, forwarded_for, retry_after_header
+from models import Character, Favorite, Planet, User
+from utils import DEFAULT_PAGE_SIZE, validate_expand, validate_pagination
+from versions import versions_state, versions_statement
+
+ASYNC_PARAMS = ("limit", "after", "expand")
+CONDITIONAL_HEADERS = (b"if-none-match", b"if-modified-since")
+
+app = create_app()
+
+def async_database_url(url):
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+engine = create_async_engine(
+    async_database_url(app.config["SQLALCHEMY_DATABASE_URI"]),
+    **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {})
+)
+Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+# The async engine has a pool of its own, sized like the Flask one, so it
+# gets a cap of its own; the token buckets are shared with the Flask app.
+admission = AsyncAdmissionControl(app.config["MAX_CONCURRENT_DB_REQUESTS"], app.config["ADMISSION_TIMEOUT"]) \
+    if app.config["MAX_CONCURRENT_DB_REQUESTS"] > 0 else None
+
+def get_page_params(request):
+    is_valid, errors = validate_pagination(request.query_params)
+    if not is_valid:
+        raise InvalidAPIUsage(message="Bad Request", status_code=400, payload=errors)
+    return request.query_params.get("limit", DEFAULT_PAGE_SIZE), request.query_params.get("after")
+
+def get_expand_params(request, allowed):
+    is_valid, errors = validate_expand(request.query_params, allowed)
+    if not is_valid:
+        raise InvalidAPIUsage(message="Bad Request", status_code=400, payload=errors)
+    expand = request.query_params.get("expand", "").split(",")
+    return tuple(relation for relation in allowed if relation in expand)
+
+async def read_state(session, models):
+    # Read before the rows: a write committed in between leaves an older
+    # version on a newer body, which costs a 200 later, never a wrong 304.
+    return versions_state(models, (await session.execute(versions_statement(models))).all())
+
+def with_validators(response, request, version, last_modified):
+    # The ETag of conditional() in the Flask app, over werkzeug's full_path,
+    # so a client can revalidate a response from either path with the other.
+    # It is weak here: this body is not byte-identical to Flask's (key order,
+    # trailing newline, gzip), and a strong tag would break range requests.
+    full_path = f"{request.scope['path']}?{request.scope['query_string'].decode('utf-8', 'replace')}"
+    response.headers["ETag"] = quote_etag(hashlib.sha1(f"{full_path}|{version}".encode()).hexdigest(), weak=True)
+    if is_settled(last_modified):
+        response.headers["Last-Modified"] = format_http_date(http_date(last_modified))
+    return response
+
+async def fetch_page(statement, model, request, models, expand=()):
+    limit, after = get_page_params(request)
+    limit = int(limit)
+    if after is not None:
+        statement = statement.where(model.id > int(after))
+    for relation in expand:
+        statement = statement.options(joinedload(getattr(model, relation)))
+    async with Session() as session:
+        version, last_modified = await read_state(session, models)
+        rows = (await session.execute(statement.order_by(model.id).limit(limit + 1))).scalars().all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return with_validators(JSONResponse({
+        "results": [row.serialize(expand) if expand else row.serialize() for row in rows[:limit]],
+        "next": next_cursor
+    }), request, version, last_modified)
+
+async def fetch_by_id(model, row_id, request, models, expand=()):
+    statement = select(model).where(model.id == row_id)
+    for relation in expand:
+        statement = statement.options(joinedload(getattr(model, relation)))
+    async with Session() as session:
+        version, last_modified = await read_state(session, models)
+        row = (await session.execute(statement)).scalars().first()
+    if row is None:
+        return JSONResponse({ "message": f"{model.__name__} with ID {row_id} not found." }, status_code=404)
+    return with_validators(JSONResponse(row.serialize(expand) if expand else row.serialize()), request, version, last_modified)
+
+async def fetch_planets(request):
+    return await fetch_page(select(Planet), Planet, request, [Planet])
+
+async def fetch_planet_by_id(request):
+    return await fetch_by_id(Planet, request.path_params["planet_id"], request, [Planet])
+
+async def fetch_characters(request):
+    expand = get_expand_params(request, CHARACTER_EXPANSIONS)
+    return await fetch_page(select(Character), Character, request, character_models(expand), expand)
+
+async def fetch_character_by_id(request):
+    expand = get_expand_params(request, CHARACTER_EXPANSIONS)
+    return await fetch_by_id(Character, request.path_params["character_id"], request, character_models(expand), expand)
+
+async def fetch_favorites_by_user_id(request):
+    user_id = request.path_params["user_id"]
+    expand = get_expand_params(request, FAVORITE_EXPANSIONS)
+    async with Session() as session:
+        user = await session.get(User, user_id)
+    if user is None:
+        return JSONResponse({ "message": f"User with ID {user_id} not found." }, status_code=404)
+    return await fetch_page(select(Favorite).where(Favorite.user_id == user_id), Favorite, request, favorite_models(expand, False), expand)
+
+wsgi = WSGIMiddleware(app)
+
+# Full lists spend from the expensive budget, as in app.EXPENSIVE_ENDPOINTS.
+EXPENSIVE_READS = (fetch_characters, fetch_planets, fetch_favorites_by_user_id)
+
+reads = Router(routes=[
+    Route("/people", fetch_characters),
+    Route("/people/{character_id:int}", fetch_character_by_id),
+    Route("/planets", fetch_planets),
+    Route("/planets/{planet_id:int}", fetch_planet_by_id),
+    Route("/favorites/{user_id:int}", fetch_favorites_by_user_id),
+], default=wsgi)
+# Gzip only; responses forwarded to Flask already carry a Content-Encoding
+# and are passed through untouched.
+compressed_reads = GZipMiddleware(reads, minimum_size=app.config["COMPRESSION_MIN_SIZE"])
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    route = read_route(scope) if scope["type"] == "http" else None
+    if route is None:
+        # Flask limits and admits what it serves itself.
+        return await wsgi(scope, receive, send)
+    retry_after = limit_request(scope, route.endpoint in EXPENSIVE_READS)
+    if retry_after:
+        return await rejected("Too Many Requests", 429, retry_after)(scope, receive, send)
+    if admission is not None and not await admission.enter():
+        return await rejected("Service Unavailable", 503, 1)(scope, receive, send)
+    try:
+        await compressed_reads(scope, receive, send)
+    except InvalidAPIUsage as e:
+        await JSONResponse(e.to_dict(), status_code=e.status_code)(scope, receive, send)
+    finally:
+        if admission is not None:
+            admission.leave()
+
+def limit_request(scope, is_expensive):
+    """Spends a token as limits.setup_limits does for the Flask views;
+    returns 0 or the seconds until the client's next token."""
+    if not app.config["RATE_LIMIT_ENABLED"]:
+        return 0
+    headers = { name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"] }
+    remote_addr = forwarded_for(scope["client"][0] if scope.get("client") else None, headers.get("x-forwarded-for"), app.config["PROXY_FIX_HOPS"])
+    client = api_client_key(headers.get("x-api-key"), remote_addr, app.config["API_KEYS"])
+    return app.extensions["limiters"]["expensive" if is_expensive else "cheap"].acquire(client)
+
+def rejected(message, status_code, retry_after):
+    return JSONResponse({ "message": message }, status_code=status_code, headers={ "Retry-After": retry_after_header(retry_after) })
+
+def read_route(scope):
+    """Returns the route of `reads` that serves the request, or None when it
+    belongs to Flask."""
+    if scope["method"] not in ("GET", "HEAD"):
+        return None
+    if any(name in CONDITIONAL_HEADERS for name, value in scope["headers"]):
+        return None
+    params = parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)
+    if not all(key in ASYNC_PARAMS for key, value in params):
+        return None
+    return next((route for route in reads.routes if route.matches(scope)[0] == Match.FULL), None)
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({ "type": "lifespan.startup.complete" })
+        elif message["type"] == "lifespan.shutdown":
+            await engine.dispose()
+            await send({ "type": "lifespan.shutdown.complete" })
+            return
@@ -0,0 +1,371 @@
+import json
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+from urllib.parse import urlencode
+from flask import current_app
+from sqlalchemy import event
+from commands import IMPORT_CHUNK_SIZE, insert_rows
+from projection import projection_for
+from models import db, Character, Color, Entity, Favorite, Gender, Planet, User
+from versions import bump
+
+GENDERS = ("male", "female", "n/a")
+COLORS = ("black", "blue", "blond", "brown", "fair", "gold", "green", "grey", "orange", "pale", "red", "tan", "white", "yellow")
+
+def generate_dataset(users, planets, characters, favorites, seed=42):
+    """Inserts a reproducible synthetic dataset; returns the row counts.
+
+    The same arguments always produce the same rows, so benchmark runs on
+    different commits are comparable.
+    """
+    rng = random.Random(seed)
+    insert_rows(Color.__table__, [{ "name": name } for name in COLORS])
+    insert_rows(Gender.__table__, [{ "name": name } for name in GENDERS])
+    insert_rows(Entity.__table__, [
+        { "name": "Character", "path": "people" },
+        { "name": "Planet", "path": "planets" }
+    ])
+    color_ids = [row.id for row in db.session.query(Color.id)]
+    gender_ids = [row.id for row in db.session.query(Gender.id)]
+    entity_ids = { row.path: row.id for row in db.session.query(Entity.id, Entity.path) }
+
+    for start in range(0, users, IMPORT_CHUNK_SIZE):
+        insert_rows(User.__table__, [
+            {
+                "name": f"User {i}",
+                "email": f"user{i}@example.com",
+                "hashed_password": f"{rng.getrandbits(128):032x}",
+                "is_active": rng.random() < 0.9
+            }
+            for i in range(start, min(start + IMPORT_CHUNK_SIZE, users))
+        ])
+
+    for start in range(0, planets, IMPORT_CHUNK_SIZE):
+        insert_rows(Planet.__table__, [
+            {
+                "name": f"Planet {i}",
+                "diameter": rng.randint(1000, 200000),
+                "rotation_period": rng.randint(1, 100),
+                "orbital_period": rng.randint(50, 5000),
+                "gravity": round(rng.uniform(0, 5), 2),
+                "population": rng.randint(0, 2 ** 31 - 1),
+                "surface_water": rng.randint(0, 100)
+            }
+            for i in range(start, min(start + IMPORT_CHUNK_SIZE, planets))
+        ])
+    planet_ids = [row.id for row in db.session.query(Planet.id).order_by(Planet.id)]
+
+    for start in range(0, characters, IMPORT_CHUNK_SIZE):
+        insert_rows(Character.__table__, [
+            {
+                "name": f"Character {i}",
+                "homeworld_id": rng.choice(planet_ids) if planet_ids and rng.random() < 0.9 else None,
+                "eye_color_id": rng.choice(color_ids),
+                "hair_color_id": rng.choice(color_ids) if rng.random() < 0.8 else None,
+                "skin_color_id": rng.choice(color_ids),
+                "gender_id": rng.choice(gender_ids),
+                "birth_year": f"{rng.randint(0, 900)}BBY",
+                "height": rng.randint(60, 260),
+                "mass": rng.randint(15, 1400)
+            }
+            for i in range(start, min(start + IMPORT_CHUNK_SIZE, characters))
+        ])
+    character_ids = [row.id for row in db.session.query(Character.id).order_by(Character.id)]
+    user_ids = [row.id for row in db.session.query(User.id).order_by(User.id)]
+
+    # Favorite i goes to user i % users and its k-th favorite walks the target
+    # list from a per-user offset, so (user, type, entity) never repeats.
+    targets = [(entity_ids["people"], row_id) for row_id in character_ids] + [(entity_ids["planets"], row_id) for row_id in planet_ids]
+    if favorites > len(user_ids) * len(targets):
+        raise ValueError(f"At most {len(user_ids) * len(targets)} favorites fit this dataset")
+    rows = []
+    for i in range(favorites):
+        user_index, k = i % len(user_ids), i // len(user_ids)
+        entity_type_id, entity_id = targets[(k + user_index * 31) % len(targets)]
+        rows.append({
+            "user_id": user_ids[user_index],
+            "entity_type_id": entity_type_id,
+            "entity_id": entity_id
+        })
+        if len(rows) == IMPORT_CHUNK_SIZE:
+            insert_rows(Favorite.__table__, rows)
+            rows = []
+    insert_rows(Favorite.__table__, rows)
+    bump(Color, Gender, Entity, User, Planet, Character, Favorite)
+    db.session.commit()
+    return {
+        "users": len(user_ids),
+        "planets": len(planet_ids),
+        "characters": len(character_ids),
+        "favorites": favorites
+    }
+
+DELETE_BATCH_SIZE = 10
+FAVORITES_BATCH_SIZE = 100
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+class Scenarios:
+    """One request builder per endpoint; builders may use ids created earlier."""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.run_id = f"{seed}-{time.time_ns()}"
+        self.created = dict()
+
+    def load_samples(self):
+        self.character_ids = [row.id for row in db.session.query(Character.id).order_by(Character.id).limit(1000)]
+        self.planet_ids = [row.id for row in db.session.query(Planet.id).order_by(Planet.id).limit(1000)]
+        self.color_ids = [row.id for row in db.session.query(Color.id)]
+        self.gender_ids = [row.id for row in db.session.query(Gender.id)]
+        self.entity_ids = [row.id for row in db.session.query(Entity.id)]
+        self.user_ids = [row.id for row in db.session.query(User.id).order_by(User.id).limit(1000)]
+        self.favorite_user_id = self.user_ids[-1]
+        # The bulk favorites routes get a user of their own, so they do not
+        # race create_favorite for the same pairs.
+        self.bulk_favorite_user_id = self.user_ids[-2] if len(self.user_ids) > 1 else self.user_ids[-1]
+        self.search_terms = [row.name for row in db.session.query(Character.name).order_by(Character.id).limit(100)] \
+            + [row.name for row in db.session.query(Planet.name).order_by(Planet.id).limit(100)]
+
+    def seed_deletions(self, requests):
+        """Inserts the rows the delete_*_batch scenarios remove, DELETE_BATCH_SIZE
+        per request; the create scenarios only leave enough for the single deletes."""
+        prefix = f"bench-{self.run_id}-batch-"
+        count = requests * DELETE_BATCH_SIZE
+        insert_rows(Color.__table__, [{ "name": f"{prefix}{j}" } for j in range(count)])
+        insert_rows(Gender.__table__, [{ "name": f"{prefix}{j}" } for j in range(count)])
+        insert_rows(Planet.__table__, [
+            { "name": f"{prefix}{j}", "diameter": 1, "rotation_period": 1, "orbital_period": 1, "gravity": 1, "population": 1, "surface_water": 1 }
+            for j in range(count)
+        ])
+        insert_rows(Character.__table__, [{ "name": f"{prefix}{j}", "height": 170, "mass": 70 } for j in range(count)])
+        bump(Color, Gender, Planet, Character)
+        db.session.commit()
+        self.batch_ids = {
+            model: [row.id for row in db.session.query(model.id).filter(model.name.like(f"{prefix}%")).order_by(model.id)]
+            for model in (Color, Gender, Planet, Character)
+        }
+
+    def take_batch(self, model):
+        ids, self.batch_ids[model] = self.batch_ids[model][:DELETE_BATCH_SIZE], self.batch_ids[model][DELETE_BATCH_SIZE:]
+        return ",".join(str(row_id) for row_id in ids) or "0"
+
+    def favorites_batch(self, i):
+        # Request i adds, and later removes, its own slice of the samples.
+        targets = [("people", row_id) for row_id in self.character_ids] + [("planets", row_id) for row_id in self.planet_ids]
+        return [
+            { "type": entity_type, "id": row_id }
+            for entity_type, row_id in (targets[(i * FAVORITES_BATCH_SIZE + j) % len(targets)] for j in range(FAVORITES_BATCH_SIZE))
+        ]
+
+    def pick(self, ids):
+        return self.rng.choice(ids)
+
+    def take(self, key):
+        created = self.created.get(key, [])
+        return created.pop() if created else 0
+
+    def has(self, endpoint):
+        return endpoint in self.builders(0)
+
+    def build(self, endpoint, i):
+        return self.builders(i)[endpoint]()
+
+    def builders(self, i):
+        name = f"bench-{self.run_id}-{i}"
+        return {
+            "sitemap": lambda: ("get", "/", None),
+            "fetch_cache_stats": lambda: ("get", "/cache/stats", None),
+            "fetch_planet_stats": lambda: ("get", "/stats/planets", None),
+            "fetch_character_stats": lambda: ("get", "/stats/people", None),
+            "fetch_favorite_stats": lambda: ("get", "/stats/favorites", None),
+            "fetch_entities": lambda: ("get", "/entities", None),
+            "fetch_entity_by_id": lambda: ("get", f"/entities/{self.pick(self.entity_ids)}", None),
+            "fetch_genders": lambda: ("get", "/genders", None),
+            "fetch_gender_by_id": lambda: ("get", f"/genders/{self.pick(self.gender_ids)}", None),
+            "create_gender": lambda: ("post", "/genders", { "name": name }),
+            "delete_gender": lambda: ("delete", f"/genders/{self.take('create_gender')}", None),
+            "delete_genders_batch": lambda: ("delete", f"/genders?ids={self.take_batch(Gender)}", None),
+            "fetch_colors": lambda: ("get", "/colors", None),
+            "fetch_color_by_id": lambda: ("get", f"/colors/{self.pick(self.color_ids)}", None),
+            "create_color": lambda: ("post", "/colors", { "name": name }),
+            "delete_color": lambda: ("delete", f"/colors/{self.take('create_color')}", None),
+            "delete_colors_batch": lambda: ("delete", f"/colors?ids={self.take_batch(Color)}", None),
+            "fetch_characters": lambda: ("get", f"/people?after={self.pick(self.character_ids)}", None),
+            "fetch_character_by_id": lambda: ("get", f"/people/{self.pick(self.character_ids)}?expand=homeworld,gender", None),
+            "create_character": lambda: ("post", "/people", { "name": name, "height": 170, "mass": 70, "homeworld_id": self.pick(self.planet_ids), "gender_id": self.pick(self.gender_ids) }),
+            "create_characters_batch": lambda: ("post", "/people/batch", [{ "name": f"{name}-{j}", "height": 170, "mass": 70, "eye_color_id": self.pick(self.color_ids) } for j in range(100)]),
+            "delete_character": lambda: ("delete", f"/people/{self.take('create_character')}", None),
+            "delete_characters_batch": lambda: ("delete", f"/people?ids={self.take_batch(Character)}", None),
+            "fetch_planets": lambda: ("get", f"/planets?after={self.pick(self.planet_ids)}", None),
+            "fetch_planet_by_id": lambda: ("get", f"/planets/{self.pick(self.planet_ids)}", None),
+            "create_planet": lambda: ("post", "/planets", { "name": name, "diameter": 1, "rotation_period": 1, "orbital_period": 1, "gravity": 1, "population": 1, "surface_water": 1 }),
+            "delete_planet": lambda: ("delete", f"/planets/{self.take('create_planet')}", None),
+            "delete_planets_batch": lambda: ("delete", f"/planets?ids={self.take_batch(Planet)}", None),
+            "search": lambda: ("get", f"/search?{urlencode({ 'q': self.pick(self.search_terms) })}", None),
+            "fetch_users": lambda: ("get", f"/users?after={self.pick(self.user_ids)}", None),
+            "fetch_user_by_id": lambda: ("get", f"/users/{self.pick(self.user_ids)}", None),
+            "fetch_top_favorites": lambda: ("get", "/favorites/top?type=people&limit=25", None),
+            "fetch_favorites_by_user_id": lambda: ("get", f"/favorites/{self.pick(self.user_ids)}", None),
+            "create_favorite": lambda: ("post", f"/favorites/{self.favorite_user_id}/people/{self.character_ids[i % len(self.character_ids)]}", None),
+            "delete_favorite": lambda: ("delete", f"/favorites/{self.favorite_user_id}/people/{self.character_ids[i % len(self.character_ids)]}", None),
+            "create_favorites_batch": lambda: ("post", f"/favorites/{self.bulk_favorite_user_id}", self.favorites_batch(i)),
+            "delete_favorites_batch": lambda: ("delete", f"/favorites/{self.bulk_favorite_user_id}", self.favorites_batch(i)),
+        }
+
+    def record(self, endpoint, response):
+        if response.status_code == 201 and response.is_json and "id" in response.get_json():
+            self.created.setdefault(endpoint, []).append(response.get_json()["id"])
+
+SKIPPED_ENDPOINTS = ("static", "populate_db")
+
+def run_benchmark(app, requests, seed=42):
+    scenarios = Scenarios(seed)
+    statements = [0]
+
+    def count_statement(*args):
+        statements[0] += 1
+
+    with app.app_context():
+        scenarios.load_samples()
+        scenarios.seed_deletions(requests)
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", count_statement)
+    client = app.test_client()
+    endpoints = []
+    for rule in app.url_map.iter_rules():
+        # Scenarios are keyed by view name, without the blueprint prefix.
+        endpoint = rule.endpoint.rpartition(".")[2]
+        if endpoint not in endpoints and endpoint not in SKIPPED_ENDPOINTS and not rule.rule.startswith("/admin"):
+            endpoints.append(endpoint)
+    # Writes run before the deletes that consume the rows they create.
+    endpoints.sort(key=lambda endpoint: endpoint.startswith("delete_"))
+
+    results = dict()
+    try:
+        for endpoint in endpoints:
+            if not scenarios.has(endpoint):
+                results[endpoint] = { "skipped": "no scenario" }
+                continue
+            latencies = []
+            statement_counts = []
+            errors = 0
+            started = time.perf_counter()
+            for i in range(requests):
+                method, url, body = scenarios.build(endpoint, i)
+                statements[0] = 0
+                request_started = time.perf_counter()
+                response = getattr(client, method)(url, json=body)
+                latencies.append((time.perf_counter() - request_started) * 1000)
+                statement_counts.append(statements[0])
+                errors += response.status_code >= 500
+                scenarios.record(endpoint, response)
+            elapsed = time.perf_counter() - started
+            results[endpoint] = {
+                "requests": requests,
+                "errors": errors,
+                "throughput_rps": round(requests / elapsed, 2),
+                "p50_ms": round(percentile(latencies, 0.50), 3),
+                "p95_ms": round(percentile(latencies, 0.95), 3),
+                "p99_ms": round(percentile(latencies, 0.99), 3),
+                "sql_statements_per_request": round(sum(statement_counts) / len(statement_counts), 2)
+            }
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+    return results
+
+SERIALIZED_MODELS = (User, Color, Planet, Gender, Character, Entity, Favorite)
+
+def rows_per_second(rows, elapsed):
+    return round(rows / elapsed) if elapsed > 0 else None
+
+def measure_serialization(limit, repeat=3):
+    """Times loading and encoding up to `limit` rows of every model, both as
+    ORM objects with serialize() and json, and as projected row tuples with
+    the app's JSON provider. Must run inside an app context.
+
+    Each path keeps its best of `repeat` runs; the session is cleared before
+    every run so the ORM path always pays for the identity map.
+    """
+    results = dict()
+    for model in SERIALIZED_MODELS:
+        projection = projection_for(model)
+        serialize = projection.serializer()
+        timings = { "orm": [], "projection": [] }
+        rows = 0
+        for _ in range(repeat):
+            db.session.expunge_all()
+            started = time.perf_counter()
+            objects = model.query.order_by(model.id).limit(limit).all()
+            json.dumps([row.serialize() for row in objects])
+            timings["orm"].append(time.perf_counter() - started)
+            started = time.perf_counter()
+            projected = projection.query(model.query).order_by(model.id).limit(limit).all()
+            current_app.json.dumps(list(map(serialize, projected)))
+            timings["projection"].append(time.perf_counter() - started)
+            rows = len(projected)
+        results[model.__tablename__] = {
+            "rows": rows,
+            "orm_rows_per_second": rows_per_second(rows, min(timings["orm"])),
+            "projection_rows_per_second": rows_per_second(rows, min(timings["projection"]))
+        }
+    return results
+
+# On Linux ru_maxrss survives exec, so a probe forked from a large parent
+# reports the parent's peak; VmHWM belongs to the probe's own memory map.
+STARTUP_PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import wsgi
+startup_ms = (time.perf_counter() - started) * 1000
+try:
+    with open("/proc/self/status") as status:
+        max_rss_kb = next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+except OSError:
+    max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    "startup_ms": startup_ms,
+    "max_rss_kb": max_rss_kb,
+    "routes": len(list(wsgi.application.url_map.iter_rules()))
+}))
+"""
+
+def measure_startup(runs, env, cwd):
+    """Imports the app in `runs` fresh interpreters, as a new worker would.
+
+    Returns the median import-and-build time and peak RSS across the runs.
+    """
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", STARTUP_PROBE], env=env, cwd=cwd, capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        "runs": runs,
+        "startup_ms": round(percentile([sample["startup_ms"] for sample in samples], 0.50), 1),
+        "max_rss_mb": round(percentile([sample["max_rss_kb"] for sample in samples], 0.50) / 1024, 1),
+        "routes": samples[0]["routes"]
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def dataset_counts():
+    return { model.__tablename__: db.session.query(model).count() for model in (User, Planet, Character, Favorite) }
+
+def write_report(path, database, dataset, results):
+    with open(path, "w") as f:
+        json.dump({
+            "commit": git_commit(),
+            "started_at": datetime.now().isoformat(),
+            "database": database,
+            "dataset": dataset,
+            "endpoints": results
+        }, f, indent=2, sort_keys=True)
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import time
+from bisect import bisect_right
+from threading import Lock
+from replicas import on_primary
+from versions import table_versions
+
+class LookupCache:
+    """Per-worker read-through cache for small lookup tables.
+
+    The whole table is loaded on the first read and kept as serialized rows.
+    Writes in this worker call invalidate(); the TTL bounds how long rows
+    changed by other workers (or the admin) can stay stale.
+    """
+
+    def __init__(self, model, ttl=60):
+        self.model = model
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._rows = None
+        self._ids = []
+        self._by_id = dict()
+        self._loaded_at = 0
+        self._version = None
+        self._last_modified = None
+
+    def _load(self):
+        # Reloads follow invalidations after writes, so a lagging replica
+        # would cache stale rows for a whole TTL.
+        with on_primary():
+            # The version is read first: a write committed between the two
+            # reads can only make Last-Modified older than the rows, which
+            # costs a 200, never a wrong 304. Deletes move it too.
+            version, last_modified = table_versions(self.model)
+            models = self.model.query.order_by(self.model.id).all()
+        rows = [row.serialize() for row in models]
+        self._version = hashlib.sha1(json.dumps(rows, sort_keys=True).encode()).hexdigest()
+        self._last_modified = last_modified or max((row.updated_at for row in models), default=None)
+        self._by_id = { row["id"]: row for row in rows }
+        self._ids = [row["id"] for row in rows]
+        self._rows = rows
+        self._loaded_at = time.monotonic()
+
+    def rows(self):
+        with self._lock:
+            if self._rows is None or time.monotonic() - self._loaded_at > self.ttl:
+                self.misses += 1
+                self._load()
+            else:
+                self.hits += 1
+            return self._rows
+
+    def get(self, row_id):
+        self.rows()
+        return self._by_id.get(row_id)
+
+    def has(self, row_id):
+        return self.get(row_id) is not None
+
+    def page(self, limit, after):
+        rows = self.rows()
+        start = bisect_right(self._ids, after) if after is not None else 0
+        page = rows[start:start + limit]
+        next_cursor = page[-1]["id"] if start + limit < len(rows) else None
+        return page, next_cursor
+
+    def state(self):
+        self.rows()
+        return self._version, self._last_modified
+
+    def invalidate(self):
+        with self._lock:
+            self._rows = None
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._rows) if self._rows is not None else 0
+        }
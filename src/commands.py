@@ -0,0 +1,317 @@
+import csv
+import io
+import json
+import os
+import re
+import time
+import click
+from datetime import datetime
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Character, Color, Entity, Favorite, Gender, Planet, User
+from utils import MAX_FAVORITES_BATCH_SIZE, MAX_INTEGER, validate_character, validate_planet
+from versions import bump
+
+IMPORT_CHUNK_SIZE = 10000
+UNKNOWN_VALUES = ("", "unknown", "n/a", "none")
+NUMBER_PATTERN = re.compile(r"-?\d+(\.\d+)?")
+
+def read_records(path):
+    """Reads a JSON list, a SWAPI page ({"results": [...]}) or NDJSON file."""
+    with open(path) as f:
+        content = f.read()
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
+    if isinstance(data, dict):
+        return data.get("results", [data])
+    return data
+
+def parse_text(value):
+    if value is None or str(value).strip().lower() in UNKNOWN_VALUES:
+        return None
+    return str(value).strip()
+
+def parse_number(value):
+    if isinstance(value, (int, float)):
+        return value
+    text = parse_text(value)
+    if text is None:
+        return None
+    match = NUMBER_PATTERN.search(text.replace(",", ""))
+    if match is None:
+        return None
+    number = float(match.group())
+    return int(number) if number.is_integer() else number
+
+def insert_rows(table, rows):
+    """Inserts rows in chunks: COPY on PostgreSQL, executemany elsewhere."""
+    if len(rows) == 0:
+        return
+    now = datetime.now()
+    for column in ("created_at", "updated_at"):
+        if column in table.c:
+            for row in rows:
+                row.setdefault(column, now)
+    columns = list(rows[0].keys())
+    connection = db.session.connection()
+    for start in range(0, len(rows), IMPORT_CHUNK_SIZE):
+        chunk = rows[start:start + IMPORT_CHUNK_SIZE]
+        if connection.dialect.name == "postgresql":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in chunk:
+                writer.writerow(["\\N" if row[column] is None else row[column] for column in columns])
+            buffer.seek(0)
+            cursor = connection.connection.cursor()
+            cursor.copy_expert(
+                f"COPY \"{table.name}\" ({','.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer
+            )
+        else:
+            connection.execute(table.insert(), chunk)
+
+def insert_ignoring_conflicts(table, rows, index_elements):
+    # A multi-row INSERT whose rows that hit the unique index are skipped by
+    # the database instead of failing the whole statement.
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table).values(rows).on_conflict_do_nothing(index_elements=index_elements)
+    if dialect == "sqlite":
+        return sqlite.insert(table).values(rows).on_conflict_do_nothing(index_elements=index_elements)
+    return insert(table).values(rows).prefix_with("IGNORE")
+
+def name_index(model):
+    return { row.name: row.id for row in db.session.query(model.id, model.name) }
+
+class Importer:
+    def __init__(self):
+        self.planet_urls = dict()
+
+    def run(self, label, load):
+        started = time.perf_counter()
+        inserted, skipped = load()
+        elapsed = time.perf_counter() - started
+        rate = inserted / elapsed if elapsed > 0 else 0
+        click.echo(f"{label}: {inserted} rows in {elapsed:.2f}s ({rate:,.0f} rows/s), {skipped} skipped")
+
+    def lookup_names(self, model, names):
+        known = name_index(model)
+        missing = sorted(set(name for name in names if name is not None and name not in known))
+        insert_rows(model.__table__, [{ "name": name } for name in missing])
+        return name_index(model) if missing else known
+
+    def import_lookup(self, model, records):
+        names = [parse_text(record.get("name") if isinstance(record, dict) else record) for record in records]
+        before = len(name_index(model))
+        after = len(self.lookup_names(model, names))
+        return after - before, len(names) - (after - before)
+
+    def import_planets(self, records):
+        known = name_index(Planet)
+        rows = []
+        urls = dict()
+        skipped = 0
+        for record in records:
+            payload = {
+                "name": parse_text(record.get("name")),
+                "diameter": parse_number(record.get("diameter")),
+                "rotation_period": parse_number(record.get("rotation_period")),
+                "orbital_period": parse_number(record.get("orbital_period")),
+                "gravity": parse_number(record.get("gravity")),
+                "population": parse_number(record.get("population")),
+                "surface_water": parse_number(record.get("surface_water"))
+            }
+            if record.get("url"):
+                urls[record["url"]] = payload["name"]
+            is_valid, errors = validate_planet(payload)
+            if not is_valid or payload["name"] in known or payload["population"] > MAX_INTEGER:
+                skipped += 1
+                continue
+            known[payload["name"]] = None
+            rows.append(payload)
+        insert_rows(Planet.__table__, rows)
+        planet_ids = name_index(Planet)
+        self.planet_urls = { url: planet_ids[name] for url, name in urls.items() if name in planet_ids }
+        return len(rows), skipped
+
+    def import_people(self, records):
+        colors = set()
+        genders = set()
+        for record in records:
+            colors.update(parse_text(record.get(key)) for key in ("eye_color", "hair_color", "skin_color"))
+            genders.add(parse_text(record.get("gender")))
+        color_ids = self.lookup_names(Color, colors)
+        gender_ids = self.lookup_names(Gender, genders)
+        planet_ids = name_index(Planet)
+        planet_urls = self.planet_urls
+
+        rows = []
+        skipped = 0
+        for record in records:
+            homeworld = parse_text(record.get("homeworld"))
+            payload = {
+                "name": parse_text(record.get("name")),
+                "height": parse_number(record.get("height")),
+                "mass": parse_number(record.get("mass"))
+            }
+            birth_year = parse_text(record.get("birth_year"))
+            if birth_year is not None:
+                payload["birth_year"] = birth_year
+            is_valid, errors = validate_character(payload)
+            if not is_valid:
+                skipped += 1
+                continue
+            payload.update({
+                "birth_year": birth_year,
+                "homeworld_id": planet_urls.get(homeworld, planet_ids.get(homeworld)),
+                "eye_color_id": color_ids.get(parse_text(record.get("eye_color"))),
+                "hair_color_id": color_ids.get(parse_text(record.get("hair_color"))),
+                "skin_color_id": color_ids.get(parse_text(record.get("skin_color"))),
+                "gender_id": gender_ids.get(parse_text(record.get("gender")))
+            })
+            rows.append(payload)
+        insert_rows(Character.__table__, rows)
+        return len(rows), skipped
+
+    def import_favorites(self, records):
+        entity_types = { entity.path: entity.id for entity in Entity.query.all() }
+        user_ids = set(row.id for row in db.session.query(User.id))
+        names = {
+            "people": name_index(Character),
+            "planets": name_index(Planet)
+        }
+        # Only the file's own pairs are remembered; favorites already in the
+        # table are skipped by the unique index, never loaded here.
+        seen = set()
+        rows = []
+        skipped = 0
+        for record in records:
+            entity_type_id = entity_types.get(record.get("type"))
+            entity_id = record.get("entity_id")
+            if entity_id is None:
+                entity_id = names.get(record.get("type"), dict()).get(record.get("name"))
+            key = (record.get("user_id"), entity_type_id, entity_id)
+            if record.get("user_id") not in user_ids or entity_type_id is None or entity_id is None or key in seen:
+                skipped += 1
+                continue
+            seen.add(key)
+            rows.append({ "user_id": key[0], "entity_type_id": key[1], "entity_id": key[2] })
+        inserted = 0
+        for start in range(0, len(rows), MAX_FAVORITES_BATCH_SIZE):
+            statement = insert_ignoring_conflicts(Favorite.__table__, rows[start:start + MAX_FAVORITES_BATCH_SIZE], ["user_id", "entity_type_id", "entity_id"])
+            inserted += db.session.execute(statement).rowcount
+        return inserted, skipped + len(rows) - inserted
+
+def setup_commands(app):
+    @app.cli.command("import-data")
+    @click.option("--colors", type=click.Path(exists=True), help="Colors as names or {\"name\": ...} objects.")
+    @click.option("--genders", type=click.Path(exists=True), help="Genders as names or {\"name\": ...} objects.")
+    @click.option("--planets", type=click.Path(exists=True), help="SWAPI planets.")
+    @click.option("--people", type=click.Path(exists=True), help="SWAPI people; homeworld may be a planet name or a URL from --planets.")
+    @click.option("--favorites", type=click.Path(exists=True), help="{\"user_id\", \"type\", \"entity_id\" or \"name\"} objects.")
+    def import_data(colors, genders, planets, people, favorites):
+        """Bulk-loads JSON or NDJSON dumps, replacing /populate for large datasets.
+
+        Files are loaded in dependency order inside a single transaction.
+        Rows that fail validation, and planets, colors, genders or favorites
+        that already exist, are skipped and counted.
+        """
+        importer = Importer()
+        try:
+            if colors:
+                importer.run("colors", lambda: importer.import_lookup(Color, read_records(colors)))
+            if genders:
+                importer.run("genders", lambda: importer.import_lookup(Gender, read_records(genders)))
+            if planets:
+                importer.run("planets", lambda: importer.import_planets(read_records(planets)))
+            if people:
+                importer.run("people", lambda: importer.import_people(read_records(people)))
+            if favorites:
+                importer.run("favorites", lambda: importer.import_favorites(read_records(favorites)))
+            # The rows bypass the API handlers, so the versions move here.
+            bump(Color, Gender, Planet, Character, Favorite)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    @app.cli.command("bench-seed")
+    @click.option("--users", default=1000, show_default=True)
+    @click.option("--planets", default=1000, show_default=True)
+    @click.option("--characters", default=1000, show_default=True)
+    @click.option("--favorites", default=10000, show_default=True)
+    @click.option("--seed", default=42, show_default=True)
+    def bench_seed(users, planets, characters, favorites, seed):
+        """Fills an empty database with a reproducible synthetic dataset."""
+        from benchmark import generate_dataset
+        if db.session.query(Character.id).first() is not None or db.session.query(User.id).first() is not None:
+            raise click.ClickException("The database is not empty; point DATABASE_URL at a scratch database.")
+        started = time.perf_counter()
+        counts = generate_dataset(users, planets, characters, favorites, seed)
+        elapsed = time.perf_counter() - started
+        click.echo(f"seeded {counts} in {elapsed:.2f}s ({sum(counts.values()) / elapsed:,.0f} rows/s)")
+
+    @app.cli.command("bench-run")
+    @click.option("--requests", default=200, show_default=True, help="Requests per endpoint.")
+    @click.option("--seed", default=42, show_default=True)
+    @click.option("--output", default="bench.json", show_default=True, type=click.Path())
+    def bench_run(requests, seed, output):
+        """Drives every route through the test client and writes a JSON report."""
+        from benchmark import dataset_counts, run_benchmark, write_report
+        # Every benchmark request comes from the same client.
+        app.config["RATE_LIMIT_ENABLED"] = False
+        results = run_benchmark(app, requests, seed)
+        write_report(output, db.engine.dialect.name, dataset_counts(), results)
+        for endpoint, result in results.items():
+            if "skipped" in result:
+                click.echo(f"{endpoint:32} skipped ({result['skipped']})")
+            else:
+                click.echo(f"{endpoint:32} {result['throughput_rps']:>9} req/s  p50 {result['p50_ms']:>8} ms  p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  {result['sql_statements_per_request']:>5} sql/req")
+        click.echo(f"report written to {output}")
+
+    @app.cli.command("bench-startup")
+    @click.option("--runs", default=5, show_default=True, help="Fresh interpreters per mode.")
+    def bench_startup(runs):
+        """Measures cold start and per-worker RSS with and without the admin."""
+        from benchmark import measure_startup
+        for mode, api_only in (("full", ""), ("api-only", "1")):
+            env = dict(os.environ, API_ONLY=api_only)
+            result = measure_startup(runs, env, os.path.dirname(os.path.abspath(__file__)))
+            click.echo(f"{mode:10} {result['startup_ms']:>8} ms  {result['max_rss_mb']:>7} MB RSS  {result['routes']:>3} routes")
+
+    @app.cli.command("bench-serialize")
+    @click.option("--limit", default=10000, show_default=True, help="Rows per model.")
+    @click.option("--repeat", default=3, show_default=True)
+    def bench_serialize(limit, repeat):
+        """Compares rows/s of ORM serialize() with projected rows, per model."""
+        from benchmark import measure_serialization
+        for table, result in measure_serialization(limit, repeat).items():
+            click.echo(f"{table:10} {result['rows']:>8} rows  orm {result['orm_rows_per_second']!s:>10} rows/s  projection {result['projection_rows_per_second']!s:>10} rows/s")
+
+    @app.cli.command("rebuild-stats")
+    def rebuild_stats():
+        """Recomputes the /stats summary rows from the base tables.
+
+        Needed after enabling STATS_SUMMARY and after loads that bypass the
+        API handlers, such as import-data and bench-seed.
+        """
+        from stats import rebuild
+        started = time.perf_counter()
+        rows = rebuild()
+        db.session.commit()
+        click.echo(f"rebuilt {rows} summary rows in {time.perf_counter() - started:.2f}s")
+
+    @app.cli.command("rebuild-favorite-counts")
+    def rebuild_favorite_counts_command():
+        """Recomputes the /favorites/top counters from the favorite table.
+
+        Needed after loads that bypass the API handlers, such as import-data
+        and bench-seed.
+        """
+        from stats import rebuild_favorite_counts
+        started = time.perf_counter()
+        rows = rebuild_favorite_counts()
+        db.session.commit()
+        click.echo(f"rebuilt {rows} counters in {time.perf_counter() - started:.2f}s")
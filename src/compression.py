@@ -0,0 +1,97 @@
+import gzip
+from collections import OrderedDict
+from threading import Lock
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CACHE_SIZE = 256
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+def negotiate(accept_encodings):
+    # Brotli wins ties: it is smaller than gzip at a similar CPU cost.
+    candidates = ("br", "gzip") if brotli is not None else ("gzip",)
+    best, best_quality = None, 0
+    for candidate in candidates:
+        if accept_encodings[candidate] > best_quality:
+            best, best_quality = candidate, accept_encodings[candidate]
+    return best
+
+class CompressedBodyCache:
+    """Per-worker LRU of compressed bodies keyed by (ETag, encoding).
+
+    The ETag changes whenever the body does, so entries never need to be
+    invalidated; the oldest ones are dropped past CACHE_SIZE.
+    """
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._bodies = OrderedDict()
+
+    def get_or_compress(self, key, body, encoding):
+        with self._lock:
+            if key in self._bodies:
+                self.hits += 1
+                self._bodies.move_to_end(key)
+                return self._bodies[key]
+            self.misses += 1
+        compressed = compress(body, encoding)
+        with self._lock:
+            self._bodies[key] = compressed
+            while len(self._bodies) > self.size:
+                self._bodies.popitem(last=False)
+        return compressed
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._bodies)
+        }
+
+def setup_compression(app, is_cacheable):
+    """Compresses JSON responses of at least COMPRESSION_MIN_SIZE bytes.
+
+    Bodies of endpoints accepted by is_cacheable are compressed once per
+    ETag and encoding. Streamed responses are sent as they are.
+    """
+    body_cache = CompressedBodyCache()
+
+    @app.after_request
+    def compress_response(response):
+        if response.status_code != 200 \
+                or response.is_streamed \
+                or response.mimetype != "application/json" \
+                or "Content-Encoding" in response.headers:
+            return response
+        response.vary.add("Accept-Encoding")
+        body = response.get_data()
+        if len(body) < app.config["COMPRESSION_MIN_SIZE"]:
+            return response
+        encoding = negotiate(request.accept_encodings)
+        if encoding is None:
+            return response
+        etag, is_weak = response.get_etag()
+        if etag is not None and request.endpoint is not None and is_cacheable(request.endpoint):
+            compressed = body_cache.get_or_compress((etag, encoding), body, encoding)
+        else:
+            compressed = compress(body, encoding)
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        if etag is not None:
+            # Weak, so If-None-Match still matches the identity ETag the
+            # conditional decorator computes.
+            response.set_etag(etag, weak=True)
+        return response
+
+    return body_cache
@@ -0,0 +1,51 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from flask import request, jsonify, make_response
+
+def is_not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since is not None and last_modified is not None:
+        return http_date(last_modified) <= request.if_modified_since
+    return False
+
+def http_date(value):
+    # Timestamps are stored as naive local times (datetime.now).
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+def is_settled(last_modified):
+    # HTTP dates have one-second resolution: until the second of the last
+    # write is over, another write could land in it and If-Modified-Since
+    # would not see it. Such responses are validated by ETag only.
+    return last_modified is not None and http_date(last_modified) < http_date(datetime.now())
+
+def with_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if is_settled(last_modified):
+        response.last_modified = http_date(last_modified)
+    return response
+
+def conditional(get_state):
+    """Answers If-None-Match / If-Modified-Since with 304 before the view runs.
+
+    get_state receives the view arguments and returns (version, last_modified),
+    which must be cheap to compute. The ETag also covers the query string,
+    since pages and expansions of the same table have different bodies.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            try:
+                version, last_modified = get_state(**kwargs)
+            except Exception as e:
+                return jsonify({ "message": str(e) }), 500
+            etag = hashlib.sha1(f"{request.full_path}|{version}".encode()).hexdigest()
+            if is_not_modified(etag, last_modified):
+                return with_validators(make_response("", 304), etag, last_modified)
+            response = make_response(view(**kwargs))
+            if response.status_code == 200:
+                with_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,147 @@
+import asyncio
+import math
+import time
+from threading import BoundedSemaphore, Lock
+from flask import current_app, g, jsonify, request
+
+MAX_BUCKETS = 10000
+
+class TokenBucketLimiter:
+    """One token bucket per client; a request spends one token.
+
+    Buckets refill at `rate` tokens per second up to `burst`. Full buckets
+    carry no state, so they are dropped once MAX_BUCKETS clients are tracked.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._lock = Lock()
+        self._buckets = dict()
+
+    def acquire(self, client):
+        """Returns 0 when the request may go ahead, otherwise the seconds
+        until the client's next token."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            if tokens < 1:
+                self._buckets[client] = (tokens, now)
+                return (1 - tokens) / self.rate
+            self._buckets[client] = (tokens - 1, now)
+            if len(self._buckets) > MAX_BUCKETS:
+                self._prune(now)
+            return 0
+
+    def _prune(self, now):
+        for client, (tokens, updated_at) in list(self._buckets.items()):
+            if tokens + (now - updated_at) * self.rate >= self.burst:
+                del self._buckets[client]
+
+class AdmissionControl:
+    """Caps the requests running DB-bound handlers at once in this worker.
+
+    A request that cannot get a slot within `timeout` seconds is shed with
+    503 instead of queueing for a connection behind a saturated pool.
+    """
+
+    def __init__(self, limit, timeout):
+        self.limit = limit
+        self.timeout = timeout
+        self.shed = 0
+        self._slots = BoundedSemaphore(limit)
+
+    def enter(self):
+        if self._slots.acquire(timeout=self.timeout):
+            return True
+        self.shed += 1
+        return False
+
+    def leave(self):
+        self._slots.release()
+
+class AsyncAdmissionControl:
+    """AdmissionControl for coroutines, which must not block the event loop."""
+
+    def __init__(self, limit, timeout):
+        self.limit = limit
+        self.timeout = timeout
+        self.shed = 0
+        self._slots = asyncio.Semaphore(limit)
+
+    async def enter(self):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.shed += 1
+            return False
+
+    def leave(self):
+        self._slots.release()
+
+def forwarded_for(remote_addr, header, hops):
+    # The address ProxyFix(x_for=hops) gives Flask, for servers it does not wrap.
+    values = header.split(",") if hops and header else []
+    return values[-hops].strip() if len(values) >= hops > 0 else remote_addr
+
+def api_client_key(api_key, remote_addr, api_keys):
+    # Only configured keys get buckets of their own; accepting any value
+    # would let a client mint a fresh budget with every request.
+    if api_key and api_key in api_keys:
+        return f"key:{api_key}"
+    return remote_addr
+
+def client_key():
+    return api_client_key(request.headers.get("X-API-Key"), request.remote_addr, current_app.config["API_KEYS"])
+
+def retry_after_header(retry_after):
+    return str(max(1, math.ceil(retry_after)))
+
+def rejected(message, status_code, retry_after):
+    response = jsonify({ "message": message })
+    response.status_code = status_code
+    response.headers["Retry-After"] = retry_after_header(retry_after)
+    return response
+
+def setup_limits(app, is_expensive, is_db_bound):
+    """Rate-limits every endpoint but /metrics and caps DB-bound concurrency.
+
+    is_expensive and is_db_bound receive the endpoint name. Expensive
+    endpoints spend from their own, smaller budget. Both the buckets and
+    the concurrency cap are per worker; the buckets are kept in
+    app.extensions["limiters"] for entry points that bypass Flask.
+    """
+    limiters = {
+        "cheap": TokenBucketLimiter(app.config["RATE_LIMIT_CHEAP_RATE"], app.config["RATE_LIMIT_CHEAP_BURST"]),
+        "expensive": TokenBucketLimiter(app.config["RATE_LIMIT_EXPENSIVE_RATE"], app.config["RATE_LIMIT_EXPENSIVE_BURST"])
+    }
+    admission = AdmissionControl(app.config["MAX_CONCURRENT_DB_REQUESTS"], app.config["ADMISSION_TIMEOUT"]) \
+        if app.config["MAX_CONCURRENT_DB_REQUESTS"] > 0 else None
+    app.extensions["limiters"] = limiters
+
+    @app.before_request
+    def limit_request():
+        endpoint = request.endpoint
+        if endpoint is None or endpoint in ("static", "fetch_metrics"):
+            return None
+        if current_app.config["RATE_LIMIT_ENABLED"]:
+            budget = "expensive" if is_expensive(endpoint) else "cheap"
+            retry_after = limiters[budget].acquire(client_key())
+            if retry_after:
+                return rejected("Too Many Requests", 429, retry_after)
+        if admission is not None and is_db_bound(endpoint):
+            if not admission.enter():
+                return rejected("Service Unavailable", 503, 1)
+            g.admitted = True
+        return None
+
+    @app.teardown_request
+    def release_slot(exception):
+        # Streamed responses keep the request context, and so the slot,
+        # until the last chunk is sent.
+        if g.pop("admitted", False):
+            admission.leave()
+
+    return admission
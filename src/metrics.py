@@ -0,0 +1,121 @@
+import time
+from threading import Lock
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from projection import FastJSONProvider
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.series = dict()
+
+    def observe(self, labels, value):
+        counts, total, count = self.series.get(labels, ([0] * len(self.buckets), 0, 0))
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+        self.series[labels] = (counts, total + value, count + 1)
+
+    def render(self, name, help_text):
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            label_text = format_labels(labels)
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{name}_bucket{{{label_text},le=\"{bound}\"}} {bucket_count}")
+            lines.append(f"{name}_bucket{{{label_text},le=\"+Inf\"}} {count}")
+            lines.append(f"{name}_sum{{{label_text}}} {total}")
+            lines.append(f"{name}_count{{{label_text}}} {count}")
+        return lines
+
+def format_labels(labels):
+    return ",".join(f"{key}=\"{value}\"" for key, value in labels)
+
+class Metrics:
+    """Per-process request metrics rendered in the Prometheus text format.
+
+    Each gunicorn worker keeps its own counters; Prometheus should scrape
+    every worker (or aggregate them) to see the whole picture.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.db_time = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+
+    def observe(self, endpoint, method, status, latency, db_time, queries):
+        labels = (("endpoint", endpoint), ("method", method), ("status", status))
+        with self._lock:
+            self.latency.observe(labels, latency)
+            self.db_time.observe(labels, db_time)
+            self.queries.observe(labels, queries)
+
+    def render(self, engines):
+        with self._lock:
+            lines = self.latency.render("http_request_duration_seconds", "Request latency by endpoint.")
+            lines += self.db_time.render("http_request_db_seconds", "Time spent in SQL statements per request.")
+            lines += self.queries.render("http_request_sql_statements", "SQL statements issued per request.")
+        lines += [
+            "# HELP db_pool_connections Connection pool usage by engine.",
+            "# TYPE db_pool_connections gauge"
+        ]
+        for name, engine in engines.items():
+            pool = engine.pool
+            for state in ("size", "checkedout", "checkedin", "overflow"):
+                if hasattr(pool, state):
+                    lines.append(f"db_pool_connections{{engine=\"{name}\",state=\"{state}\"}} {getattr(pool, state)()}")
+        return "\n".join(lines) + "\n"
+
+class TimedJSONProvider(FastJSONProvider):
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            if has_app_context():
+                g.serialize_time = g.get("serialize_time", 0) + time.perf_counter() - started
+
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    if has_app_context():
+        g.sql_statements = g.get("sql_statements", 0) + 1
+        g.sql_time = g.get("sql_time", 0) + elapsed
+
+def setup_metrics(app, get_engines):
+    metrics = Metrics()
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        if "request_started" not in g:
+            return response
+        latency = time.perf_counter() - g.request_started
+        db_time = g.get("sql_time", 0)
+        serialize_time = g.get("serialize_time", 0)
+        response.headers["Server-Timing"] = ", ".join([
+            f"db;dur={db_time * 1000:.2f}",
+            f"serialize;dur={serialize_time * 1000:.2f}",
+            f"total;dur={latency * 1000:.2f}"
+        ])
+        if request.endpoint is not None:
+            metrics.observe(request.endpoint, request.method, response.status_code, latency, db_time, g.get("sql_statements", 0))
+        return response
+
+    @app.route("/metrics")
+    def fetch_metrics():
+        return metrics.render(get_engines()), 200, { "Content-Type": "text/plain; version=0.0.4" }
+
+    return metrics
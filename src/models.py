@@ -1,7 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from replicas import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={ "class_": RoutingSession })
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -11,6 +12,7 @@ class User(db.Model):
     is_active = db.Column(db.Boolean, nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+    serialized_columns = ("id", "email")
 
     def __repr__(self):
         return f"<User {self.email}>"
@@ -26,6 +28,7 @@ class Color(db.Model):
     name = db.Column(db.String, nullable=False, unique=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+    serialized_columns = ("id", "name")
 
     def __repr__(self):
         return f"<Color {self.name}>"
@@ -48,6 +51,13 @@ class Planet(db.Model):
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
 
+    __table_args__ = (
+        db.Index("ix_planet_population_id", "population", "id"),
+        db.Index("ix_planet_diameter_id", "diameter", "id"),
+        db.Index("ix_planet_gravity_id", "gravity", "id"),
+    )
+    serialized_columns = ("id", "name", "diameter", "rotation_period", "orbital_period", "gravity", "population", "surface_water")
+
     def __repr__(self):
         return f"<Planet {self.name}>"
     
@@ -68,6 +78,7 @@ class Gender(db.Model):
     name = db.Column(db.String, nullable=False, unique=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+    serialized_columns = ("id", "name")
 
     def __repr__(self):
         return f"<Gender {self.name}>"
@@ -91,12 +102,28 @@ class Character(db.Model):
     mass = db.Column(db.Float, nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+    homeworld = db.relationship("Planet", foreign_keys=[homeworld_id])
+    eye_color = db.relationship("Color", foreign_keys=[eye_color_id])
+    hair_color = db.relationship("Color", foreign_keys=[hair_color_id])
+    skin_color = db.relationship("Color", foreign_keys=[skin_color_id])
+    gender = db.relationship("Gender", foreign_keys=[gender_id])
+    __table_args__ = (
+        db.Index("ix_character_homeworld_id_id", "homeworld_id", "id"),
+        db.Index("ix_character_gender_id_id", "gender_id", "id"),
+        db.Index("ix_character_eye_color_id_id", "eye_color_id", "id"),
+        db.Index("ix_character_hair_color_id_id", "hair_color_id", "id"),
+        db.Index("ix_character_skin_color_id_id", "skin_color_id", "id"),
+        db.Index("ix_character_name_id", "name", "id"),
+        db.Index("ix_character_height_id", "height", "id"),
+        db.Index("ix_character_mass_id", "mass", "id"),
+    )
+    serialized_columns = ("id", "homeworld_id", "eye_color_id", "hair_color_id", "skin_color_id", "name", "birth_year", "gender_id", "height", "mass")
 
     def __repr__(self):
         return f"<Character {self.name}>"
     
-    def serialize(self):
-        return {
+    def serialize(self, expand=()):
+        data = {
             "id": self.id,
             "homeworld_id": self.homeworld_id,
             "eye_color_id": self.eye_color_id,
@@ -108,6 +135,10 @@ class Character(db.Model):
             "height": self.height,
             "mass": self.mass
         }
+        for relation in expand:
+            related = getattr(self, relation)
+            data[relation] = related.serialize() if related is not None else None
+        return data
 
 class Entity(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -115,6 +146,7 @@ class Entity(db.Model):
     path = db.Column(db.String, nullable=False, unique=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+    serialized_columns = ("id", "name", "path")
 
     def __repr__(self):
         return f"<Entity {self.name}>"
@@ -132,15 +164,59 @@ class Favorite(db.Model):
     entity_id = db.Column(db.Integer, nullable=False)
     entity_type_id = db.Column(db.Integer, db.ForeignKey("entity.id"), nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
-    db.UniqueConstraint(user_id, entity_id, entity_type_id)
+    entity_type = db.relationship("Entity")
+    __table_args__ = (
+        db.Index("ix_favorite_user_id_entity", "user_id", "entity_type_id", "entity_id", unique=True),
+        db.Index("ix_favorite_user_id_id", "user_id", "id"),
+        db.Index("ix_favorite_entity", "entity_type_id", "entity_id"),
+    )
+    serialized_columns = ("id", "user_id", "entity_id", "entity_type_id")
 
     def __repr__(self):
         return f"<Favorite {self.id}>"
     
-    def serialize(self):
-        return {
+    def serialize(self, expand=()):
+        data = {
             "id": self.id,
             "user_id": self.user_id,
             "entity_id": self.entity_id,
             "entity_type_id": self.entity_type_id
         }
+        if "entity_type" in expand:
+            data["entity_type"] = self.entity_type.serialize()
+        return data
+
+class Statistic(db.Model):
+    """Summary rows of the /stats endpoints, kept up to date by the write
+    handlers when STATS_SUMMARY is set; see stats.py."""
+    name = db.Column(db.String(50), primary_key=True)
+    bucket = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    size = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<Statistic {self.name} {self.bucket}>"
+
+class FavoriteCount(db.Model):
+    """How many users favorited each character or planet; backs
+    /favorites/top and is updated with every favorite write."""
+    entity_type_id = db.Column(db.Integer, db.ForeignKey("entity.id"), primary_key=True, autoincrement=False)
+    entity_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    __table_args__ = (
+        db.Index("ix_favorite_count_rank", "entity_type_id", "total", "entity_id"),
+    )
+
+    def __repr__(self):
+        return f"<FavoriteCount {self.entity_type_id} {self.entity_id}>"
+
+class TableVersion(db.Model):
+    """One counter per table, moved by every write through the API and the
+    admin; list ETags and Last-Modified read it instead of the rows. See
+    versions.py."""
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    def __repr__(self):
+        return f"<TableVersion {self.name} {self.version}>"
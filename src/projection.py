@@ -0,0 +1,83 @@
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import inspect
+from sqlalchemy.orm import aliased
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class Projection:
+    """Serializes list pages from plain row tuples instead of ORM objects.
+
+    Only the model's serialized_columns (the keys of its serialize(), in
+    order) are selected, and each expanded many-to-one relation is an outer
+    join selecting the serialized columns of the related model. Rows skip
+    the identity map, and each one becomes a dict with a single zip.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.related = { relation.key: relation.mapper.class_ for relation in inspect(model).relationships }
+        self._serializers = dict()
+
+    def query(self, query, expand=()):
+        columns = [getattr(self.model, name) for name in self.model.serialized_columns]
+        joins = []
+        for relation in expand:
+            related = aliased(self.related[relation])
+            joins.append(getattr(self.model, relation).of_type(related))
+            columns += [getattr(related, name).label(f"{relation}__{name}") for name in self.related[relation].serialized_columns]
+        query = query.with_entities(*columns)
+        for join in joins:
+            query = query.outerjoin(join)
+        return query
+
+    def serializer(self, expand=()):
+        if expand not in self._serializers:
+            self._serializers[expand] = self._build_serializer(expand)
+        return self._serializers[expand]
+
+    def _build_serializer(self, expand):
+        keys = self.model.serialized_columns
+        width = len(keys)
+        if not expand:
+            return lambda row: dict(zip(keys, row))
+        groups = []
+        start = width
+        for relation in expand:
+            related_keys = self.related[relation].serialized_columns
+            groups.append((relation, related_keys, start, start + len(related_keys)))
+            start += len(related_keys)
+
+        def serialize(row):
+            data = dict(zip(keys, row[:width]))
+            for relation, related_keys, first, last in groups:
+                # The related id is None when the outer join found no row.
+                data[relation] = dict(zip(related_keys, row[first:last])) if row[first] is not None else None
+            return data
+        return serialize
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Encodes with orjson when it is installed, and with json otherwise.
+
+    Datetimes, decimals and other types orjson would format differently go
+    through the default() hook, so both backends produce the same output.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or "cls" in kwargs:
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=kwargs.get("default", self.default), option=option).decode()
+
+projections = dict()
+
+def projection_for(model):
+    if model not in projections:
+        projections[model] = Projection(model)
+    return projections[model]
@@ -0,0 +1,76 @@
+import time
+from threading import Lock
+from models import db, Entity
+from replicas import on_primary
+
+class EntityType:
+    def __init__(self, id, name, path, model):
+        self.id = id
+        self.name = name
+        self.path = path
+        self.model = model
+
+    def exists(self, entity_id):
+        return db.session.query(self.model.id).filter_by(id=entity_id).first() is not None
+
+    def existing_ids(self, entity_ids):
+        if not entity_ids:
+            return set()
+        return set(row.id for row in db.session.query(self.model.id).filter(self.model.id.in_(entity_ids)))
+
+class EntityRegistry:
+    """Maps Entity rows to the model that stores them.
+
+    Models are registered by path when the app is set up. The Entity rows
+    are read on first use and kept for `ttl` seconds, like LookupCache, so
+    favorite routes rarely query the entity table; Entity rows without a
+    registered model cannot be favorited. An empty table is not kept: a
+    worker that started before the rows existed reads them again next time.
+    """
+
+    def __init__(self, ttl=60):
+        self.models = dict()
+        self.ttl = ttl
+        self._lock = Lock()
+        self._by_path = None
+        self._by_id = None
+        self._loaded_at = 0
+
+    def register(self, path, model):
+        self.models[path] = model
+        self.invalidate()
+
+    def _load(self):
+        with self._lock:
+            if not self._by_path or time.monotonic() - self._loaded_at > self.ttl:
+                with on_primary():
+                    entity_types = [
+                        EntityType(entity.id, entity.name, entity.path, self.models[entity.path])
+                        for entity in Entity.query.all()
+                        if entity.path in self.models
+                    ]
+                self._by_id = { entity_type.id: entity_type for entity_type in entity_types }
+                self._by_path = { entity_type.path: entity_type for entity_type in entity_types }
+                self._loaded_at = time.monotonic()
+            return self._by_path, self._by_id
+
+    def by_path(self, path):
+        by_path, by_id = self._load()
+        return by_path.get(path)
+
+    def by_id(self, entity_type_id):
+        by_path, by_id = self._load()
+        return by_id.get(entity_type_id)
+
+    def by_model(self, model):
+        by_path, by_id = self._load()
+        return next((entity_type for entity_type in by_id.values() if entity_type.model is model), None)
+
+    def all(self):
+        by_path, by_id = self._load()
+        return list(by_id.values())
+
+    def invalidate(self):
+        with self._lock:
+            self._by_path = None
+            self._by_id = None
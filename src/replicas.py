@@ -0,0 +1,82 @@
+import time
+from contextlib import contextmanager
+from itertools import count
+from threading import Lock
+from flask import g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA_COOLDOWN = 30
+
+class ReplicaSet:
+    """Round-robin choice among the replica binds, skipping unhealthy ones.
+
+    A replica is taken out of rotation for REPLICA_COOLDOWN seconds when one
+    of its connections fails. When every replica is down, reads fall back to
+    the primary.
+    """
+
+    def __init__(self, keys=()):
+        self.keys = list(keys)
+        self._counter = count()
+        self._lock = Lock()
+        self._down_until = dict()
+
+    def choose(self):
+        now = time.monotonic()
+        with self._lock:
+            start = next(self._counter)
+        for offset in range(len(self.keys)):
+            key = self.keys[(start + offset) % len(self.keys)]
+            if self._down_until.get(key, 0) <= now:
+                return key
+        return None
+
+    def mark_down(self, key):
+        self._down_until[key] = time.monotonic() + REPLICA_COOLDOWN
+
+    def watch(self, key, engine):
+        @event.listens_for(engine, "handle_error")
+        def on_error(context):
+            if context.is_disconnect or context.connection is None:
+                self.mark_down(key)
+
+class RoutingSession(Session):
+    """Sends reads to the replica in g.replica; writes and flushes always go
+    to the primary."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get("replica"):
+            return self._db.engines[g.replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+@contextmanager
+def on_primary():
+    replica = g.get("replica") if has_app_context() else None
+    if replica:
+        g.replica = None
+    try:
+        yield
+    finally:
+        if replica:
+            g.replica = replica
+
+def setup_replicas(app, db, is_read):
+    with app.app_context():
+        replica_set = ReplicaSet(key for key in db.engines if key is not None and key.startswith("replica_"))
+        for key in replica_set.keys:
+            replica_set.watch(key, db.engines[key])
+    app.extensions["replica_set"] = replica_set
+
+    @app.before_request
+    def route_reads():
+        # One replica per request: the ETag and the body it validates must
+        # come from the same snapshot, whatever the replicas' lag.
+        use_replica = bool(replica_set.keys) \
+            and request.method in ("GET", "HEAD") \
+            and request.endpoint is not None \
+            and is_read(request.endpoint) \
+            and request.headers.get("X-Read-Primary") != "1"
+        g.replica = replica_set.choose() if use_replica else None
+
+    return replica_set
@@ -0,0 +1,220 @@
+import json
+import time
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from urllib.parse import urlencode
+from flask import current_app, request, make_response
+from replicas import on_primary
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+CACHED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+def table_tag(model):
+    return model.__tablename__
+
+def row_tag(model, row_id):
+    return f"{model.__tablename__}:{row_id}"
+
+class MemoryBackend:
+    """Per-worker LRU bounded by the total size of the cached values.
+
+    Writes only invalidate the worker that handled them, so with several
+    workers the other copies stay stale for up to the TTL.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._lock = Lock()
+        self._entries = OrderedDict()
+        self._tags = dict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, tags, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, tags, ttl):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, tags, time.monotonic() + ttl)
+            self.size += len(value)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        value, tags, expires_at = entry
+        self.size -= len(value)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+class RedisBackend:
+    """Shared by every worker and node pointed at the same Redis.
+
+    Each tag is a Redis set holding the keys that carry it, so a write
+    deletes exactly the responses it affects. Tag sets expire with the
+    entries they index.
+    """
+
+    def __init__(self, client, prefix="response:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, tags, ttl):
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, value, ex=ttl)
+        for tag in tags:
+            pipe.sadd(self.prefix + "tag:" + tag, key)
+            pipe.expire(self.prefix + "tag:" + tag, ttl)
+        pipe.execute()
+
+    def invalidate(self, tags):
+        tag_keys = [self.prefix + "tag:" + tag for tag in tags]
+        pipe = self.client.pipeline()
+        for tag_key in tag_keys:
+            pipe.smembers(tag_key)
+        keys = set(self.prefix + key.decode() for members in pipe.execute() for key in members)
+        self.client.delete(*keys, *tag_keys)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+def cache_key():
+    # Parameter order does not change the response, so it does not change the key.
+    return f"{request.path}?{urlencode(sorted(request.args.items(multi=True)))}"
+
+def encode_response(response):
+    headers = [(name, response.headers[name]) for name in CACHED_HEADERS if name in response.headers]
+    return json.dumps(headers).encode() + b"\n" + response.get_data()
+
+def decode_response(value):
+    headers, body = value.split(b"\n", 1)
+    return make_response(body, 200, json.loads(headers))
+
+class ResponseCache:
+    """Caches whole 200 GET responses by path and query string.
+
+    Disabled unless RESPONSE_CACHE_URL is set: "memory://" keeps a per-worker
+    LRU of at most RESPONSE_CACHE_MAX_BYTES, and a redis:// URL shares one
+    cache across workers. Each response is stored with the tags of what it
+    read (table_tag for whole tables, row_tag for single rows), and writes
+    invalidate the tags they change. Backend errors count as misses.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = 60
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        url = app.config["RESPONSE_CACHE_URL"]
+        self.ttl = app.config["RESPONSE_CACHE_TTL"]
+        if not url:
+            self.backend = None
+        elif url == "memory://":
+            self.backend = MemoryBackend(app.config["RESPONSE_CACHE_MAX_BYTES"])
+        elif redis is None:
+            raise RuntimeError("RESPONSE_CACHE_URL points at Redis, but the redis package is not installed.")
+        else:
+            self.backend = RedisBackend(redis.Redis.from_url(url))
+        app.extensions["response_cache"] = self
+
+    def serve(self, view, get_tags, kwargs):
+        # Streamed bodies are never stored, and would be read after the
+        # on_primary() block below ends.
+        if self.backend is None or request.method != "GET" or request.headers.get("X-Read-Primary") == "1" or request.args.get("stream") == "1":
+            return view(**kwargs)
+        key = cache_key()
+        value = self._call(self.backend.get, key)
+        if value is not None:
+            self.hits += 1
+            response = decode_response(value).make_conditional(request)
+            response.headers["X-Cache"] = "HIT"
+            return response
+        self.misses += 1
+        # Misses follow invalidations after writes, so a lagging replica
+        # would store the body from before the write for a whole TTL.
+        with on_primary():
+            response = make_response(view(**kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            self._call(self.backend.set, key, encode_response(response), list(get_tags(**kwargs)), self.ttl)
+        response.headers["X-Cache"] = "MISS"
+        return response
+
+    def invalidate(self, *tags):
+        if self.backend is not None:
+            self._call(self.backend.invalidate, tags)
+
+    def clear(self):
+        if self.backend is not None:
+            self._call(self.backend.clear)
+
+    def _call(self, method, *args):
+        try:
+            return method(*args)
+        except Exception:
+            self.errors += 1
+            return None
+
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "size": self.backend.size if isinstance(self.backend, MemoryBackend) else None
+        }
+
+def cached(get_tags):
+    """Serves the view through the app's ResponseCache; get_tags receives
+    the view arguments and returns the response's tags."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            return current_app.extensions["response_cache"].serve(view, get_tags, kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,36 @@
+import re
+from sqlalchemy import column, func, literal_column, or_, table
+from models import db
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def fts_match_expression(q):
+    # Every word must match as a prefix: "luke sky" -> "luke"* AND "sky"*
+    return " AND ".join(f'"{word}"*' for word in WORD_PATTERN.findall(q))
+
+def escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def search_query(model, q):
+    """Returns a ranked query of model rows whose name matches q.
+
+    SQLite uses the <table>_fts FTS5 index (prefix matching, bm25 rank) and
+    PostgreSQL the pg_trgm GIN index (substring and fuzzy matching, ranked
+    by similarity). Both indexes are created by migration c9a0f6e2d4b8 and
+    stay in sync with inserts and deletes. Other databases fall back to an
+    indexed prefix LIKE on (name, id).
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "sqlite":
+        fts = table(f"{model.__tablename__}_fts", column("rowid"), column("rank"))
+        return model.query \
+            .join(fts, fts.c.rowid == model.id) \
+            .filter(literal_column(fts.name).op("MATCH")(fts_match_expression(q))) \
+            .order_by(fts.c.rank, model.id)
+    if dialect == "postgresql":
+        return model.query \
+            .filter(or_(model.name.op("%")(q), model.name.ilike(f"%{escape_like(q)}%", escape="\\"))) \
+            .order_by(func.similarity(model.name, q).desc(), model.id)
+    return model.query \
+        .filter(model.name.like(f"{escape_like(q)}%", escape="\\")) \
+        .order_by(model.name, model.id)
@@ -0,0 +1,217 @@
+import math
+import time
+from threading import Lock
+from flask import current_app
+from sqlalchemy import Integer, cast, func, insert, literal
+from sqlalchemy.dialects import postgresql, sqlite
+from werkzeug.local import LocalProxy
+from models import db, Character, Favorite, FavoriteCount, Planet, Statistic
+from replicas import on_primary
+
+HISTOGRAM_WIDTH = 25
+
+def bucket(value):
+    return math.floor(value / HISTOGRAM_WIDTH)
+
+def histogram_bucket(column):
+    # PostgreSQL rounds when casting to integer, SQLite truncates and has no
+    # floor(); heights and masses are not negative, so truncating is flooring.
+    if db.session.get_bind().dialect.name == "sqlite":
+        return cast(column / HISTOGRAM_WIDTH, Integer)
+    return cast(func.floor(column / HISTOGRAM_WIDTH), Integer)
+
+# Every statistic is a GROUP BY returning (bucket, count, total) rows; the
+# summary table stores the same rows under the statistic's name. A NULL
+# group (a character without gender or homeworld) is stored as bucket 0.
+STATISTICS = {
+    "planets": lambda: db.session.query(literal(0), func.count(Planet.id), func.coalesce(func.sum(Planet.population), 0)),
+    "people": lambda: db.session.query(literal(0), func.count(Character.id), literal(0)),
+    "people.gender": lambda: db.session.query(func.coalesce(Character.gender_id, 0), func.count(Character.id), literal(0)).group_by(Character.gender_id),
+    "people.homeworld": lambda: db.session.query(func.coalesce(Character.homeworld_id, 0), func.count(Character.id), literal(0)).group_by(Character.homeworld_id),
+    "people.height": lambda: db.session.query(histogram_bucket(Character.height), func.count(Character.id), func.sum(Character.height)).group_by(histogram_bucket(Character.height)),
+    "people.mass": lambda: db.session.query(histogram_bucket(Character.mass), func.count(Character.id), func.sum(Character.mass)).group_by(histogram_bucket(Character.mass)),
+    "favorites.type": lambda: db.session.query(Favorite.entity_type_id, func.count(Favorite.id), literal(0)).group_by(Favorite.entity_type_id)
+}
+
+# Deltas take serialized rows; sign is 1 for an insert and -1 for a delete.
+def planet_deltas(planet, sign):
+    return [("planets", 0, sign, sign * planet["population"])]
+
+def character_deltas(character, sign):
+    return [
+        ("people", 0, sign, 0),
+        ("people.gender", character.get("gender_id") or 0, sign, 0),
+        ("people.homeworld", character.get("homeworld_id") or 0, sign, 0),
+        ("people.height", bucket(character["height"]), sign, sign * character["height"]),
+        ("people.mass", bucket(character["mass"]), sign, sign * character["mass"])
+    ]
+
+def favorite_deltas(entity_type_id, count):
+    return [("favorites.type", entity_type_id, count, 0)]
+
+class StatsCache:
+    """Per-worker cache of computed statistics, one per app.
+
+    Writes in this worker drop it once they commit; the TTL bounds how long
+    changes made by other workers (or the admin) stay invisible.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._lock = Lock()
+        self._values = dict()
+
+    def get(self, name, compute):
+        with self._lock:
+            value, loaded_at = self._values.get(name, (None, 0))
+            if value is None or time.monotonic() - loaded_at > self.ttl:
+                # Recomputes follow invalidations after writes, so a lagging
+                # replica would cache stale numbers for a whole TTL.
+                with on_primary():
+                    value = compute()
+                self._values[name] = (value, time.monotonic())
+            return value
+
+    def invalidate(self):
+        with self._lock:
+            self._values.clear()
+
+stats_cache = LocalProxy(lambda: current_app.extensions["stats_cache"])
+
+def summary_enabled():
+    return current_app.config["STATS_SUMMARY"]
+
+def read_statistic(name):
+    """Returns { bucket: (count, total) } from the summary table when it is
+    enabled, otherwise from a GROUP BY over the base table."""
+    if summary_enabled():
+        rows = db.session.query(Statistic.bucket, Statistic.size, Statistic.total).filter(Statistic.name == name, Statistic.size > 0)
+    else:
+        rows = STATISTICS[name]()
+    return { row[0]: (row[1], row[2] or 0) for row in rows }
+
+def record(deltas):
+    """Applies (name, bucket, count, total) deltas to the summary table, in
+    the caller's transaction. The caller drops stats_cache after it commits,
+    so a concurrent read cannot cache the values from before the commit."""
+    if not summary_enabled():
+        return
+    merged = dict()
+    for name, key, count, total in deltas:
+        previous_count, previous_total = merged.get((name, key), (0, 0))
+        merged[(name, key)] = (previous_count + count, previous_total + total)
+    rows = [{ "name": name, "bucket": key, "size": count, "total": total } for (name, key), (count, total) in merged.items() if count or total]
+    increment(Statistic.__table__, ["name", "bucket"], ["size", "total"], rows)
+
+def increment(table, keys, columns, rows):
+    """Adds each row's columns to the stored row with the same keys, or
+    inserts it; one upsert statement on PostgreSQL and SQLite."""
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = dialect_insert(table).values(rows)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=keys,
+            set_={ column: table.c[column] + statement.excluded[column] for column in columns }
+        ))
+        return
+    for row in rows:
+        updated = db.session.execute(
+            table.update()
+                .where(*(table.c[key] == row[key] for key in keys))
+                .values({ column: table.c[column] + row[column] for column in columns })
+        ).rowcount
+        if not updated:
+            db.session.execute(insert(table).values(row))
+
+def count_favorites(entity_type_id, entity_ids, delta):
+    """Moves the leaderboard counters of entity_ids by delta, in the
+    caller's transaction."""
+    increment(FavoriteCount.__table__, ["entity_type_id", "entity_id"], ["total"], [
+        { "entity_type_id": entity_type_id, "entity_id": entity_id, "total": delta }
+        for entity_id in entity_ids
+    ])
+
+def forget_favorites(entity_type_id, entity_ids):
+    db.session.execute(FavoriteCount.__table__.delete().where(
+        FavoriteCount.entity_type_id == entity_type_id,
+        FavoriteCount.entity_id.in_(entity_ids)
+    ))
+
+def top_favorited(entity_type_id, limit):
+    # A backward range read of ix_favorite_count_rank: no sort, no scan.
+    return db.session.query(FavoriteCount.entity_id, FavoriteCount.total) \
+        .filter(FavoriteCount.entity_type_id == entity_type_id, FavoriteCount.total > 0) \
+        .order_by(FavoriteCount.total.desc(), FavoriteCount.entity_id.desc()) \
+        .limit(limit) \
+        .all()
+
+def rebuild_favorite_counts():
+    """Recomputes the leaderboard counters from Favorite; returns the row count."""
+    db.session.execute(FavoriteCount.__table__.delete())
+    rows = [
+        { "entity_type_id": row[0], "entity_id": row[1], "total": row[2] }
+        for row in db.session.query(Favorite.entity_type_id, Favorite.entity_id, func.count(Favorite.id)).group_by(Favorite.entity_type_id, Favorite.entity_id)
+    ]
+    if rows:
+        db.session.execute(insert(FavoriteCount.__table__), rows)
+    return len(rows)
+
+def refresh():
+    # For writes too broad to track row by row, such as /populate.
+    if summary_enabled():
+        rebuild()
+
+def rebuild():
+    """Recomputes the summary table from the base tables; returns the row count."""
+    db.session.execute(Statistic.__table__.delete())
+    rows = [
+        { "name": name, "bucket": row[0], "size": row[1], "total": row[2] or 0 }
+        for name, query in STATISTICS.items()
+        for row in query()
+    ]
+    if rows:
+        db.session.execute(insert(Statistic.__table__), rows)
+    return len(rows)
+
+def histogram(buckets):
+    count = sum(count for count, total in buckets.values())
+    return {
+        "average": sum(total for count, total in buckets.values()) / count if count else None,
+        "histogram": [
+            { "from": key * HISTOGRAM_WIDTH, "to": (key + 1) * HISTOGRAM_WIDTH, "count": buckets[key][0] }
+            for key in sorted(buckets)
+        ]
+    }
+
+def counts_by(buckets, key):
+    return [{ key: bucket_key or None, "count": count } for bucket_key, (count, total) in sorted(buckets.items())]
+
+def planet_stats():
+    count, total = read_statistic("planets").get(0, (0, 0))
+    return {
+        "count": count,
+        "population": {
+            "total": total,
+            "average": total / count if count else None
+        }
+    }
+
+def character_stats():
+    count, total = read_statistic("people").get(0, (0, 0))
+    return {
+        "count": count,
+        "by_gender": counts_by(read_statistic("people.gender"), "gender_id"),
+        "by_homeworld": counts_by(read_statistic("people.homeworld"), "homeworld_id"),
+        "height": histogram(read_statistic("people.height")),
+        "mass": histogram(read_statistic("people.mass"))
+    }
+
+def favorite_stats():
+    by_type = read_statistic("favorites.type")
+    return {
+        "count": sum(count for count, total in by_type.values()),
+        "by_type": counts_by(by_type, "entity_type_id")
+    }
@@ -1,3 +1,7 @@
+import base64
+import json
+import math
+import re
 from flask import url_for
 
 def has_no_empty_params(rule):
@@ -6,7 +10,7 @@ def has_no_empty_params(rule):
     return len(defaults) >= len(arguments)
 
 def generate_sitemap(app):
-    links = ['/admin/']
+    links = ['/admin/'] if "admin" in app.blueprints else []
     for rule in app.url_map.iter_rules():
         # Filter out rules we can't navigate to in a browser
         # and rules that require parameters
@@ -93,6 +97,32 @@ def validate_color(payload):
 def validate_gender(payload):
     return validate_color(payload)
 
+def validate_favorite(payload):
+    errors = dict()
+    missing_keys = set(["type", "id"])
+    extra_keys = []
+
+    for key in payload:
+        value = payload[key]
+        if key == "type":
+            if not isinstance(value, str):
+                errors["type"] = "The type should be a string"
+            missing_keys.remove("type")
+        elif key == "id":
+            if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= MAX_INTEGER:
+                errors["id"] = f"The id should be an integer in [0, {MAX_INTEGER}]"
+            missing_keys.remove("id")
+        else:
+            extra_keys.append(key)
+
+    if len(missing_keys) > 0:
+        errors["missing_keys"] = ",".join(missing_keys)
+
+    if len(extra_keys) > 0:
+        errors["extra_keys"] = ",".join(extra_keys)
+
+    return (not bool(errors), errors)
+
 def validate_planet(payload):
     errors = dict()
     missing_keys = set(["name", "rotation_period", "orbital_period", "gravity", "diameter", "surface_water", "population"])
@@ -139,4 +169,150 @@ def validate_planet(payload):
     if len(extra_keys) > 0:
         errors["extra_keys"] = ",".join(extra_keys)
     
-    return (not bool(errors), errors)
\ No newline at end of file
+    return (not bool(errors), errors)
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+DEFAULT_TOP_SIZE = 10
+MAX_BATCH_SIZE = 50000
+# Sent as a single INSERT, so four bind parameters per favorite.
+MAX_FAVORITES_BATCH_SIZE = 5000
+MAX_DELETE_BATCH_SIZE = 1000
+MAX_SEARCH_DEPTH = 1000
+MAX_SEARCH_LENGTH = 100
+# Ids and other integer columns are 32-bit on PostgreSQL.
+MAX_INTEGER = 2 ** 31 - 1
+# The largest number SQLite can bind; float columns compare against it too.
+MAX_CURSOR_NUMBER = 2 ** 63 - 1
+# Sort keys over text columns; every other sort key is numeric.
+TEXT_SORTS = ("name",)
+
+def is_integer(value, maximum=MAX_INTEGER):
+    # ASCII digits only: str.isdigit() also accepts digits such as "²" that
+    # int() rejects. Longer strings are too large anyway, and are never
+    # handed to int(), which refuses very long ones.
+    return re.fullmatch(r"[0-9]+", value) is not None \
+        and len(value) <= len(str(maximum)) \
+        and int(value) <= maximum
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(token, sort_key):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except ValueError:
+        return None
+    if not isinstance(values, list) or len(values) != 2:
+        return None
+    position, row_id = values
+    if not isinstance(row_id, int) or isinstance(row_id, bool) or not 0 <= row_id <= MAX_INTEGER:
+        return None
+    # A position of the wrong type fails the comparison on PostgreSQL.
+    if sort_key in TEXT_SORTS:
+        return values if isinstance(position, str) else None
+    if isinstance(position, bool) or not isinstance(position, (int, float)):
+        return None
+    if not (math.isfinite(position) and abs(position) <= MAX_CURSOR_NUMBER):
+        return None
+    return values
+
+def validate_pagination(args, sort_key=None):
+    errors = dict()
+
+    limit = args.get("limit")
+    if limit is not None and (not is_integer(limit, MAX_PAGE_SIZE) or int(limit) == 0):
+        errors["limit"] = f"The limit should be an integer in [1, {MAX_PAGE_SIZE}]"
+
+    after = args.get("after")
+    if after is not None:
+        if sort_key is not None and decode_cursor(after, sort_key) is None:
+            errors["after"] = "The after cursor should be a next cursor returned for the same sort"
+        elif sort_key is None and not is_integer(after):
+            errors["after"] = f"The after cursor should be an integer in [0, {MAX_INTEGER}]"
+
+    stream = args.get("stream")
+    if stream is not None:
+        if stream not in ("0", "1"):
+            errors["stream"] = "The stream flag should be 0 or 1"
+        elif stream == "1" and limit is not None:
+            errors["stream"] = "The stream flag cannot be combined with a limit"
+
+    return (not bool(errors), errors)
+
+def validate_expand(args, allowed):
+    errors = dict()
+    expand = args.get("expand")
+    if expand is not None:
+        unknown = [relation for relation in expand.split(",") if relation not in allowed]
+        if len(unknown) > 0:
+            errors["expand"] = f"Unknown relations: {','.join(unknown)}. Allowed: {','.join(allowed)}"
+    return (not bool(errors), errors)
+
+def validate_flag(args, key):
+    errors = dict()
+    value = args.get(key)
+    if value is not None and value not in ("0", "1"):
+        errors[key] = f"The {key} flag should be 0 or 1"
+    return (not bool(errors), errors)
+
+def validate_filters(args, equality_keys, range_keys):
+    errors = dict()
+    for key in equality_keys:
+        value = args.get(key)
+        if value is not None and not is_integer(value):
+            errors[key] = f"The {key} should be an integer in [0, {MAX_INTEGER}]"
+    for key in range_keys:
+        for name in (f"{key}_min", f"{key}_max"):
+            value = args.get(name)
+            if value is None:
+                continue
+            try:
+                is_number = math.isfinite(float(value))
+            except ValueError:
+                is_number = False
+            if not is_number:
+                errors[name] = f"The {name} should be a real number"
+    return (not bool(errors), errors)
+
+def validate_sort(args, allowed):
+    errors = dict()
+    sort = args.get("sort")
+    if sort is not None and sort.removeprefix("-") not in allowed:
+        errors["sort"] = f"The sort should be one of {','.join(allowed)}, optionally prefixed with -"
+    return (not bool(errors), errors)
+
+def validate_search(args):
+    errors = dict()
+    q = args.get("q")
+    if q is None:
+        errors["q"] = "The q parameter is required"
+    elif len(q) > MAX_SEARCH_LENGTH:
+        errors["q"] = f"The q parameter should have at most {MAX_SEARCH_LENGTH} characters"
+    elif re.search(r"\w", q) is None:
+        errors["q"] = "The q parameter should contain a letter or a digit"
+    if "sort" in args:
+        errors["sort"] = "Search results are ranked and cannot be sorted"
+    after = args.get("after")
+    if after is not None and is_integer(after) and int(after) > MAX_SEARCH_DEPTH:
+        errors["after"] = f"Search results can only be paged up to {MAX_SEARCH_DEPTH} rows deep"
+    return (not bool(errors), errors)
+
+def validate_ids(args):
+    errors = dict()
+    ids = args.get("ids")
+    if ids is None:
+        errors["ids"] = "The ids parameter is required"
+    elif not all(is_integer(value) for value in ids.split(",")):
+        errors["ids"] = f"The ids should be a comma separated list of integers in [0, {MAX_INTEGER}]"
+    elif len(ids.split(",")) > MAX_DELETE_BATCH_SIZE:
+        errors["ids"] = f"At most {MAX_DELETE_BATCH_SIZE} ids can be deleted at once"
+    return (not bool(errors), errors)
+
+def validate_top(args):
+    errors = dict()
+    if not args.get("type"):
+        errors["type"] = "The type parameter is required"
+    limit = args.get("limit")
+    if limit is not None and (not is_integer(limit, MAX_PAGE_SIZE) or int(limit) == 0):
+        errors["limit"] = f"The limit should be an integer in [1, {MAX_PAGE_SIZE}]"
+    return (not bool(errors), errors)
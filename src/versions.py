@@ -0,0 +1,52 @@
+from datetime import datetime
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, TableVersion
+
+def table_names(models):
+    return sorted(set(model.__tablename__ for model in models))
+
+def bump(*models):
+    """Moves the version of each model's table, in the caller's transaction.
+
+    Every write calls it for the tables it changes, deletes included, so
+    list ETags and Last-Modified never have to look at the rows. Writes
+    that bypass the API and the admin must call it too.
+    """
+    table = TableVersion.__table__
+    now = datetime.now()
+    # Sorted, so concurrent writers lock the counters in the same order.
+    rows = [{ "name": name, "version": 1, "updated_at": now } for name in table_names(models)]
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = dialect_insert(table).values(rows)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=["name"],
+            set_={ "version": table.c.version + 1, "updated_at": statement.excluded.updated_at }
+        ))
+        return
+    for row in rows:
+        updated = db.session.execute(
+            table.update()
+                .where(table.c.name == row["name"])
+                .values(version=table.c.version + 1, updated_at=now)
+        ).rowcount
+        if not updated:
+            db.session.execute(insert(table).values(row))
+
+def versions_statement(models):
+    return select(TableVersion.name, TableVersion.version, TableVersion.updated_at) \
+        .where(TableVersion.name.in_(table_names(models)))
+
+def versions_state(models, rows):
+    """Turns the rows of versions_statement into (version, last_modified).
+    Tables no write has bumped yet are at version 0."""
+    versions = { name: (version, updated_at) for name, version, updated_at in rows }
+    version = ",".join(f"{name}:{versions.get(name, (0, None))[0]}" for name in table_names(models))
+    return version, max((updated_at for version, updated_at in versions.values()), default=None)
+
+def table_versions(*models):
+    """Returns (version, last_modified) of the models' tables from a single
+    primary-key lookup, whatever the size of the tables."""
+    return versions_state(models, db.session.execute(versions_statement(models)))
@@ -0,0 +1,108 @@
+import time
+import pytest
+import response_cache
+from response_cache import MemoryBackend, RedisBackend
+
+fakeredis = pytest.importorskip("fakeredis")
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    return now
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request):
+    if request.param == "memory":
+        return MemoryBackend(max_bytes=1024)
+    return RedisBackend(fakeredis.FakeRedis())
+
+def test_get_returns_what_set_stored(backend):
+    backend.set("/people?", b"people", ["character"], 60)
+    assert backend.get("/people?") == b"people"
+    assert backend.get("/planets?") is None
+
+def test_invalidate_drops_exactly_the_tagged_keys(backend):
+    backend.set("/people?", b"people", ["character"], 60)
+    backend.set("/people/1?", b"luke", ["character:1"], 60)
+    backend.set("/people/2?expand=homeworld", b"leia", ["character:2", "planet"], 60)
+    backend.set("/planets?", b"planets", ["planet"], 60)
+    backend.invalidate(["planet", "character:1"])
+    assert backend.get("/people?") == b"people"
+    assert backend.get("/people/1?") is None
+    assert backend.get("/people/2?expand=homeworld") is None
+    assert backend.get("/planets?") is None
+
+def test_invalidate_of_an_unknown_tag_keeps_every_key(backend):
+    backend.set("/people?", b"people", ["character"], 60)
+    backend.invalidate(["user"])
+    assert backend.get("/people?") == b"people"
+
+def test_clear_drops_every_key(backend):
+    backend.set("/people?", b"people", ["character"], 60)
+    backend.set("/planets?", b"planets", ["planet"], 60)
+    backend.clear()
+    assert backend.get("/people?") is None
+    assert backend.get("/planets?") is None
+
+def test_memory_evicts_least_recently_used_over_the_byte_budget():
+    backend = MemoryBackend(max_bytes=10)
+    backend.set("a", b"aaaa", ["x"], 60)
+    backend.set("b", b"bbbb", ["x"], 60)
+    assert backend.get("a") == b"aaaa"
+    backend.set("c", b"cccc", ["y"], 60)
+    assert backend.get("b") is None
+    assert backend.get("a") == b"aaaa"
+    assert backend.get("c") == b"cccc"
+    assert backend.size == 8
+
+def test_memory_skips_values_larger_than_the_budget():
+    backend = MemoryBackend(max_bytes=10)
+    backend.set("a", b"aaaa", ["x"], 60)
+    backend.set("big", b"b" * 11, ["x"], 60)
+    assert backend.get("big") is None
+    assert backend.get("a") == b"aaaa"
+    assert backend.size == 4
+
+def test_memory_replacing_a_key_counts_its_size_once():
+    backend = MemoryBackend(max_bytes=10)
+    backend.set("a", b"aaaa", ["x"], 60)
+    backend.set("a", b"aaaaaa", ["y"], 60)
+    assert backend.size == 6
+    backend.invalidate(["x"])
+    assert backend.get("a") == b"aaaaaa"
+
+def test_memory_evicted_keys_leave_their_tags():
+    backend = MemoryBackend(max_bytes=4)
+    backend.set("a", b"aaaa", ["x"], 60)
+    backend.set("b", b"bbbb", ["y"], 60)
+    assert backend.get("a") is None
+    assert "x" not in backend._tags
+
+def test_memory_entries_expire_after_their_ttl(clock):
+    backend = MemoryBackend(max_bytes=1024)
+    backend.set("a", b"aaaa", ["x"], 60)
+    clock[0] += 59
+    assert backend.get("a") == b"aaaa"
+    clock[0] += 1
+    assert backend.get("a") is None
+    assert backend.size == 0
+
+def test_redis_entries_and_tag_sets_expire_after_their_ttl():
+    client = fakeredis.FakeRedis()
+    backend = RedisBackend(client)
+    backend.set("a", b"aaaa", ["x"], 1)
+    assert 0 < client.ttl("response:a") <= 1
+    assert 0 < client.ttl("response:tag:x") <= 1
+    time.sleep(1.1)
+    assert backend.get("a") is None
+    assert not client.exists("response:tag:x")
+
+def test_redis_clear_keeps_keys_outside_its_prefix():
+    client = fakeredis.FakeRedis()
+    client.set("session:1", b"kept")
+    backend = RedisBackend(client)
+    backend.set("a", b"aaaa", ["x"], 60)
+    backend.clear()
+    assert client.get("session:1") == b"kept"
+    assert client.keys("response:*") == []